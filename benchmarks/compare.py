@@ -0,0 +1,50 @@
+import argparse
+import json
+
+METRICS = (
+    ('throughput_rps', True),
+    ('p50_ms', False),
+    ('p95_ms', False),
+    ('p99_ms', False),
+)
+
+def delta(base, new):
+    if base in (None, 0) or new is None:
+        return None
+    return (new - base) / base * 100
+
+def compare(base: dict, new: dict, threshold: float = 5.0):
+    rows = []
+    for name in sorted(set(base['results']) | set(new['results'])):
+        base_result = base['results'].get(name, {})
+        new_result = new['results'].get(name, {})
+        for metric, higher_is_better in METRICS:
+            if base_result.get(metric) is None and new_result.get(metric) is None:
+                continue
+            change = delta(base_result.get(metric), new_result.get(metric))
+            verdict = ''
+            if change is not None and abs(change) >= threshold:
+                verdict = 'better' if (change > 0) == higher_is_better else 'worse'
+            rows.append((name, metric, base_result.get(metric), new_result.get(metric), change, verdict))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare two benchmark JSON reports.')
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=5.0, help='percent change reported as better/worse')
+    args = parser.parse_args(argv)
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"base {base['meta'].get('commit')}  new {new['meta'].get('commit')}")
+    print(f"{'workload':<28}{'metric':<16}{'base':>12}{'new':>12}{'change':>10}")
+    for name, metric, base_value, new_value, change, verdict in compare(base, new, args.threshold):
+        change_text = '' if change is None else f'{change:+.1f}%'
+        print(f'{name:<28}{metric:<16}{str(base_value):>12}{str(new_value):>12}{change_text:>10}  {verdict}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Offline benchmark for the hot API endpoints.
+
+Starts local stand-ins (embedded Postgres, redis-server or fakeredis, moto S3),
+seeds them deterministically, drives the app in-process and writes throughput
+and latency percentiles to a JSON file:
+
+    python -m benchmarks.run --out bench.json
+    python -m benchmarks.compare base.json bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+
+from benchmarks.standins import StandIns, check_wipe_allowed
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True).stdout.strip())
+        return {'commit': commit, 'dirty': dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', default='bench_output.json')
+    parser.add_argument('--requests', type=int, default=500, help='measured requests per workload')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--only', nargs='*', help='run only these workloads')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--lessons', type=int, default=1000)
+    parser.add_argument('--big-lessons', type=int, default=3)
+    parser.add_argument('--big-lesson-blocks', type=int, default=5000)
+    parser.add_argument('--media-objects', type=int, default=24)
+    parser.add_argument('--i-know-this-wipes-the-db', dest='allow_wipe', action='store_true', help='allow seeding an external BENCH_DB_* database whose name does not contain "bench"')
+    return parser.parse_args(argv)
+
+async def run(args):
+    import main
+    from benchmarks.seed import SeedConfig
+    from src.bootstrap import main as bootstrap
+    from src.container import container
+
+    config = SeedConfig(
+        seed=args.seed,
+        users=args.users,
+        lessons=args.lessons,
+        big_lessons=args.big_lessons,
+        big_lesson_blocks=args.big_lesson_blocks,
+        media_objects=args.media_objects,
+    )
+    bootstrap()
+    async with main.app.router.lifespan_context(main.app):
+        return await _measure(args, config, main.app, container)
+
+async def _measure(args, config, app, container):
+    import httpx
+
+    from benchmarks.seed import seed
+    from benchmarks.workloads import build_workloads, make_token, run_workload
+
+    seed_started = time.perf_counter()
+    seeded = await seed(config, container.s3_client, container.redis_client, allow_wipe=args.allow_wipe)
+    seed_time = time.perf_counter() - seed_started
+
+    token = make_token(seeded.teacher_ids[0], 'teacher', os.environ['AUTH_SECRET_KEY'], os.environ['AUTH_ALGORITHM'])
+    workloads = build_workloads(seeded, config, {'Authorization': f'Bearer {token}'})
+    if args.only:
+        workloads = [workload for workload in workloads if workload.name in args.only]
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        for workload in workloads:
+            print(f'running {workload.name}...', file=sys.stderr)
+            results[workload.name] = await run_workload(client, workload, args.requests, args.concurrency, args.warmup, args.seed)
+            print(f"  {results[workload.name]['throughput_rps']} rps, p50 {results[workload.name]['p50_ms']} ms, "
+                  f"p99 {results[workload.name]['p99_ms']} ms, errors {results[workload.name]['errors']}", file=sys.stderr)
+
+    return {
+        'meta': {
+            **git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed_config': asdict(config),
+            'seed_time_s': round(seed_time, 3),
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'warmup': args.warmup,
+        },
+        'results': results,
+    }
+
+def main(argv=None):
+    args = parse_args(argv)
+    # checked before any stand-in starts so that a refused run has no side effects
+    check_wipe_allowed(args.allow_wipe)
+    os.environ['DB_ECHO'] = 'false'
+    with StandIns():
+        report = asyncio.run(run(args))
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'wrote {args.out}', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
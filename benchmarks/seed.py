@@ -0,0 +1,217 @@
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+from sqlalchemy.sql.elements import TextClause
+
+from benchmarks.standins import check_wipe_allowed
+from src.database.core import engine
+from src.database.models import Base, UserList, LessonList, LessonData, LessonDataTombstone, UserLesson, LessonDataType, UserRole
+
+MEDIA_SIZES = {
+    'image': 256 * 1024,
+    'audio': 1024 * 1024,
+    'video': 4 * 1024 * 1024,
+}
+MEDIA_EXT = {
+    'image': 'jpg',
+    'audio': 'mp3',
+    'video': 'mp4',
+}
+WORDS = (
+    'lesson variable function class module loop array pointer memory thread '
+    'request response database index query cache network packet stream buffer '
+    'compile runtime object method interface exception value string integer'
+).split()
+
+@dataclass
+class SeedConfig:
+    seed: int = 42
+    users: int = 2000
+    lessons: int = 1000
+    blocks_per_lesson: int = 20
+    big_lessons: int = 3
+    big_lesson_blocks: int = 5000
+    # revisions of edits replayed onto the big lessons: every 10th block edited, every 50th deleted
+    edit_history: int = 200
+    media_objects: int = 24
+    subscriptions_per_user: int = 5
+    tokens: int = 500
+    groups: int = 10
+    group_size: int = 200
+    batch_size: int = 5000
+
+@dataclass
+class SeedResult:
+    teacher_ids: list = field(default_factory=list)
+    student_ids: list = field(default_factory=list)
+    public_lessons: int = 0
+    public_lesson_ids: list = field(default_factory=list)
+    big_lesson_ids: list = field(default_factory=list)
+    # lessons of teacher_ids[0], the user the workloads authenticate as
+    owned_lesson_ids: list = field(default_factory=list)
+    group_ids: list = field(default_factory=list)
+    media: dict = field(default_factory=dict)
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+def _paragraph(rng):
+    return ' '.join(_sentence(rng, rng.randint(6, 18)) for _ in range(rng.randint(3, 12)))
+
+def _code(rng):
+    lines = []
+    for i in range(rng.randint(5, 40)):
+        lines.append(f"{'    ' * rng.randint(0, 3)}{rng.choice(WORDS)}_{i} = {rng.choice(WORDS)}({rng.randint(0, 999)})")
+    return '\n'.join(lines)
+
+async def _create_schema():
+    async with engine.begin() as conn:
+        await conn.execute(text('DROP SCHEMA public CASCADE'))
+        await conn.execute(text('CREATE SCHEMA public'))
+        await conn.execute(text('CREATE TABLE groups (id SERIAL PRIMARY KEY, title VARCHAR NOT NULL)'))
+        tables = [UserList.__table__, LessonList.__table__, LessonData.__table__, LessonDataTombstone.__table__, UserLesson.__table__]
+        await conn.run_sync(Base.metadata.create_all, tables=tables)
+        await conn.execute(text(
+            'CREATE TABLE user_group ('
+            'user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE, '
+            'group_id INTEGER NOT NULL REFERENCES groups(id) ON DELETE CASCADE, '
+            'PRIMARY KEY (user_id, group_id))'
+        ))
+
+async def _insert_batches(conn, table, rows, batch_size):
+    statement = table if isinstance(table, TextClause) else insert(table)
+    for start in range(0, len(rows), batch_size):
+        await conn.execute(statement, rows[start:start + batch_size])
+
+def _upload_media(rng, s3_client, lesson_ids, count):
+    media = {kind: [] for kind in MEDIA_SIZES}
+    kinds = list(MEDIA_SIZES)
+    for i in range(count):
+        kind = kinds[i % len(kinds)]
+        lesson_id = rng.choice(lesson_ids)
+        filename = f'{kind}_{i}.{MEDIA_EXT[kind]}'
+        key = f'{kind}/{lesson_id}/{filename}'
+        body = rng.randbytes(MEDIA_SIZES[kind])
+        s3_client.client.put_object(Bucket=s3_client.bucket, Key=key, Body=body)
+        media[kind].append({'lesson_id': lesson_id, 'filename': filename, 'key': key, 'size': len(body)})
+    return media
+
+def _blocks(rng, lesson_id, count, media):
+    rows = []
+    for order in range(1, count + 1):
+        roll = rng.random()
+        if roll < 0.08:
+            kind, content = LessonDataType.HEADER, _sentence(rng, rng.randint(2, 6))
+        elif roll < 0.16 and media:
+            kind = LessonDataType(rng.choice(list(media)))
+            content = rng.choice(media[kind.value])['key']
+        elif roll < 0.36:
+            kind, content = LessonDataType.CODE, _code(rng)
+        else:
+            kind, content = LessonDataType.TEXT, _paragraph(rng)
+        rows.append({'lesson_id': lesson_id, 'type': kind, 'content': content, 'order': order})
+    return rows
+
+async def _edit_history(conn, lesson_ids, history):
+    if not lesson_ids or history < 1:
+        return
+    # revision 1 is the seeded state; edits and deletions land on revisions 2..history + 1
+    edited_revision = '2 + (id * 7919) % :history'
+    params = {'lesson_ids': lesson_ids, 'history': history}
+    await conn.execute(text(
+        'INSERT INTO lesson_data_tombstone (data_id, lesson_id, revision) '
+        f'SELECT id, lesson_id, {edited_revision} FROM lesson_data WHERE lesson_id = ANY(:lesson_ids) AND id % 50 = 0'
+    ), params)
+    await conn.execute(text('DELETE FROM lesson_data WHERE lesson_id = ANY(:lesson_ids) AND id % 50 = 0'), params)
+    await conn.execute(text(
+        f'UPDATE lesson_data SET revision = {edited_revision} WHERE lesson_id = ANY(:lesson_ids) AND id % 10 = 0'
+    ), params)
+    await conn.execute(text('UPDATE lessons SET revision = 1 + :history WHERE id = ANY(:lesson_ids)'), params)
+
+async def seed(config: SeedConfig, s3_client, redis_client, allow_wipe: bool = False) -> SeedResult:
+    check_wipe_allowed(allow_wipe)
+    rng = random.Random(config.seed)
+    result = SeedResult()
+    await _create_schema()
+
+    users = []
+    for user_id in range(1, config.users + 1):
+        role = UserRole.TEACHER if user_id % 20 == 1 else UserRole.STUDENT
+        users.append({
+            'id': user_id,
+            'username': f'user{user_id}',
+            'email': f'user{user_id}@example.com',
+            'password': 'x' * 60,
+            'avatar': None,
+            'role': role,
+        })
+        (result.teacher_ids if role == UserRole.TEACHER else result.student_ids).append(user_id)
+
+    base_time = datetime(2025, 1, 1)
+    lessons = []
+    for lesson_id in range(1, config.lessons + 1):
+        private = rng.random() < 0.3
+        result.public_lessons += not private
+        if not private:
+            result.public_lesson_ids.append(lesson_id)
+        created = base_time + timedelta(minutes=lesson_id)
+        lessons.append({
+            'id': lesson_id,
+            'title': _sentence(rng, rng.randint(2, 7)),
+            'description': _paragraph(rng),
+            'private_access': private,
+            'created_at': created,
+            'updated_at': created,
+            'user_id': rng.choice(result.teacher_ids),
+        })
+        if lessons[-1]['user_id'] == result.teacher_ids[0]:
+            result.owned_lesson_ids.append(lesson_id)
+    result.big_lesson_ids = list(range(1, config.big_lessons + 1))
+
+    result.media = _upload_media(rng, s3_client, [lesson['id'] for lesson in lessons], config.media_objects)
+
+    subscriptions = set()
+    for user_id in result.student_ids:
+        for lesson_id in rng.sample(range(1, config.lessons + 1), config.subscriptions_per_user):
+            subscriptions.add((user_id, lesson_id))
+
+    async with engine.begin() as conn:
+        await _insert_batches(conn, UserList, users, config.batch_size)
+        await _insert_batches(conn, LessonList, lessons, config.batch_size)
+        blocks = []
+        for lesson_id in range(1, config.lessons + 1):
+            count = config.big_lesson_blocks if lesson_id in result.big_lesson_ids else config.blocks_per_lesson
+            blocks.extend(_blocks(rng, lesson_id, count, result.media))
+            if len(blocks) >= config.batch_size:
+                await _insert_batches(conn, LessonData, blocks, config.batch_size)
+                blocks = []
+        await _insert_batches(conn, LessonData, blocks, config.batch_size)
+        await _insert_batches(
+            conn,
+            UserLesson,
+            [{'user_id': user_id, 'lesson_id': lesson_id} for user_id, lesson_id in sorted(subscriptions)],
+            config.batch_size
+        )
+        result.group_ids = list(range(1, config.groups + 1))
+        await _insert_batches(conn, text('INSERT INTO groups (id, title) VALUES (:id, :title)'), [
+            {'id': group_id, 'title': f'Group {group_id}'} for group_id in result.group_ids
+        ], config.batch_size)
+        await _insert_batches(conn, text('INSERT INTO user_group (user_id, group_id) VALUES (:user_id, :group_id)'), [
+            {'user_id': user_id, 'group_id': group_id}
+            for group_id in result.group_ids
+            for user_id in rng.sample(result.student_ids, min(config.group_size, len(result.student_ids)))
+        ], config.batch_size)
+        await _edit_history(conn, result.big_lesson_ids, config.edit_history)
+        for table in ('users', 'lessons', 'lesson_data', 'groups'):
+            await conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"))
+        await conn.execute(text('ANALYZE'))
+
+    redis_client.client.flushdb()
+    pipe = redis_client.client.pipeline()
+    for i in range(config.tokens):
+        pipe.setex(f'special_token:seed{i}', timedelta(hours=24), config.lessons + 1 + i)
+    pipe.execute()
+
+    return result
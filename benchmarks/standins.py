@@ -0,0 +1,149 @@
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+def find_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for_port(host, port, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'{host}:{port} did not come up in {timeout}s')
+
+def check_wipe_allowed(allow_wipe: bool = False):
+    """Seeding drops the public schema, so an external database must be named as a benchmark one or explicitly opted in."""
+    if allow_wipe or not os.getenv('BENCH_DB_HOST'):
+        return
+    name = os.getenv('BENCH_DB_NAME', '')
+    if 'bench' not in name.lower():
+        raise RuntimeError(
+            f"Refusing to seed database {name!r}: seeding drops its public schema. "
+            "Use a database whose name contains 'bench' or pass --i-know-this-wipes-the-db."
+        )
+
+class LocalPostgres:
+    """Throwaway Postgres: an external one from BENCH_DB_* env or an embedded pgserver instance."""
+
+    def __init__(self):
+        self.server = None
+        self.workdir = None
+
+    def start(self):
+        if os.getenv('BENCH_DB_HOST'):
+            for key in ('HOST', 'PORT', 'USER', 'PASS', 'NAME'):
+                os.environ[f'DB_{key}'] = os.getenv(f'BENCH_DB_{key}', '')
+            return self
+
+        import pgserver
+
+        self.workdir = tempfile.mkdtemp(prefix='bench_pg_')
+        self.server = pgserver.get_server(self.workdir, cleanup_mode='delete')
+        info = self.server.get_postmaster_info()
+        os.environ['DB_HOST'] = str(info.socket_dir)
+        os.environ['DB_PORT'] = str(info.port)
+        os.environ['DB_USER'] = 'postgres'
+        os.environ['DB_PASS'] = ''
+        os.environ['DB_NAME'] = 'postgres'
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.cleanup()
+            self.server = None
+
+class LocalRedis:
+    """A local redis-server if one is on PATH, otherwise an in-process fakeredis server."""
+
+    def __init__(self):
+        self.process = None
+        self.fake_server = None
+
+    def start(self):
+        port = find_free_port()
+        binary = shutil.which('redis-server')
+        if binary:
+            self.process = subprocess.Popen(
+                [binary, '--port', str(port), '--save', '', '--appendonly', 'no'],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+        else:
+            from fakeredis import TcpFakeServer
+
+            self.fake_server = TcpFakeServer(('127.0.0.1', port), server_type='redis')
+            self.fake_server.daemon_threads = True
+            threading.Thread(target=self.fake_server.serve_forever, daemon=True).start()
+        wait_for_port('127.0.0.1', port)
+        os.environ['REDIS_HOST'] = '127.0.0.1'
+        os.environ['REDIS_PORT'] = str(port)
+        return self
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
+        if self.fake_server is not None:
+            self.fake_server.shutdown()
+            self.fake_server.server_close()
+            self.fake_server = None
+
+class LocalS3:
+    """moto's S3-compatible server on a free local port."""
+
+    def __init__(self, bucket='bench-lessons'):
+        self.bucket = bucket
+        self.server = None
+
+    def start(self):
+        from moto.server import ThreadedMotoServer
+
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        port = find_free_port()
+        self.server = ThreadedMotoServer(ip_address='127.0.0.1', port=port, verbose=False)
+        self.server.start()
+        wait_for_port('127.0.0.1', port)
+        os.environ['S3_ENDPOINT'] = f'http://127.0.0.1:{port}'
+        os.environ['S3_BUCKET'] = self.bucket
+        os.environ['S3_ACCESS_KEY'] = 'bench'
+        os.environ['S3_SECRET_KEY'] = 'bench'
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.stop()
+            self.server = None
+
+class StandIns:
+    def __init__(self):
+        self.services = [LocalPostgres(), LocalRedis(), LocalS3()]
+
+    def __enter__(self):
+        os.environ.setdefault('AUTH_SECRET_KEY', 'bench-secret')
+        os.environ.setdefault('AUTH_ALGORITHM', 'HS256')
+        started = []
+        try:
+            for service in self.services:
+                started.append(service.start())
+        except:
+            for service in reversed(started):
+                service.stop()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for service in reversed(self.services):
+            service.stop()
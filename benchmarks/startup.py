@@ -0,0 +1,114 @@
+"""Import-time and cold-start benchmark.
+
+Measures, in fresh interpreters against local stand-ins, how long `import main`
+takes and how long a single uvicorn worker needs from spawn to its first HTTP
+response:
+
+    python -m benchmarks.startup --out startup.json
+    python -m benchmarks.compare base_startup.json startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.run import git_revision
+from benchmarks.standins import StandIns, find_free_port
+from benchmarks.workloads import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_SNIPPET = 'import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)'
+
+def measure_import():
+    output = subprocess.run(
+        [sys.executable, '-c', IMPORT_SNIPPET],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def measure_first_response(timeout=60.0):
+    port = find_free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/__startup_probe', timeout=1)
+            except urllib.error.HTTPError:
+                pass
+            except OSError:
+                time.sleep(0.01)
+                continue
+            return time.perf_counter() - started
+        raise RuntimeError(f'server did not answer within {timeout}s')
+    finally:
+        process.terminate()
+        process.wait()
+
+def summarize(samples):
+    ordered = sorted(samples)
+    to_ms = lambda value: round(value * 1000, 3)
+    return {
+        'samples': len(ordered),
+        'mean_ms': to_ms(sum(ordered) / len(ordered)),
+        'p50_ms': to_ms(percentile(ordered, 50)),
+        'p95_ms': to_ms(percentile(ordered, 95)),
+        'p99_ms': to_ms(percentile(ordered, 99)),
+        'min_ms': to_ms(ordered[0]),
+        'max_ms': to_ms(ordered[-1]),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', default='startup_output.json')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    os.environ['DB_ECHO'] = 'false'
+    with StandIns():
+        import boto3
+
+        # provision the bucket up front so every run starts from the same state
+        boto3.client(
+            's3',
+            endpoint_url=os.environ['S3_ENDPOINT'],
+            aws_access_key_id=os.environ['S3_ACCESS_KEY'],
+            aws_secret_access_key=os.environ['S3_SECRET_KEY']
+        ).create_bucket(Bucket=os.environ['S3_BUCKET'])
+
+        results = {
+            'import_main': summarize([measure_import() for _ in range(args.repeat)]),
+            'first_response': summarize([measure_first_response() for _ in range(args.repeat)]),
+        }
+
+    report = {
+        'meta': {
+            **git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    for name, result in results.items():
+        print(f"{name}: p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms", file=sys.stderr)
+    print(f'wrote {args.out}', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import math
+import random
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+import jwt
+
+RANGE_CHUNK = 256 * 1024
+
+@dataclass
+class Workload:
+    name: str
+    build: Callable
+
+def make_token(user_id: int, role: str, secret: str, algorithm: str) -> str:
+    payload = {'id': user_id, 'username': f'user{user_id}', 'role': role, 'avatar': None}
+    return jwt.encode(payload, secret, algorithm=algorithm)
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def build_workloads(seeded, config, teacher_headers, upload_size=64 * 1024):
+    big_pages = math.ceil(config.big_lesson_blocks / 100)
+    public_page_size = 10
+    public_pages = max(1, math.ceil(seeded.public_lessons / public_page_size))
+    deep_start = max(1, int(public_pages * 0.8))
+    video = seeded.media.get('video') or []
+    upload_body = bytes(upload_size)
+    clone_sources = [lesson_id for lesson_id in seeded.public_lesson_ids if lesson_id not in seeded.big_lesson_ids]
+
+    def public_list_deep(rng):
+        page = rng.randint(deep_start, public_pages)
+        return 'GET', f'/lesson/list/public?page={page}&page_size={public_page_size}&total_count={seeded.public_lessons}', {}
+
+    def lesson_data_page(rng):
+        lesson_id = rng.choice(seeded.big_lesson_ids)
+        page = rng.randint(1, big_pages)
+        return 'GET', f'/lesson/{lesson_id}/data?page={page}&page_size=100', {}
+
+    def lesson_data_page_editing(rng):
+        lesson_id = rng.choice(seeded.big_lesson_ids)
+        page = rng.randint(1, big_pages)
+        return 'GET', f'/lesson/{lesson_id}/data?page={page}&page_size=100&is_editing=true', {}
+
+    def lesson_sync(rng):
+        # a reconnecting client is usually a few revisions behind, so since falls in the last quarter of the history
+        lesson_id = rng.choice(seeded.big_lesson_ids)
+        since = rng.randint(1 + config.edit_history * 3 // 4, 1 + config.edit_history)
+        return 'GET', f'/lesson/{lesson_id}/sync?since={since}', {}
+
+    def media_range(rng):
+        item = rng.choice(video)
+        start = rng.randrange(0, max(1, item['size'] - RANGE_CHUNK))
+        headers = {'Range': f'bytes={start}-{start + RANGE_CHUNK - 1}'}
+        return 'GET', f"/video/{item['lesson_id']}/{item['filename']}", {'headers': headers}
+
+    def upload(rng):
+        lesson_id = rng.choice(seeded.big_lesson_ids)
+        data = {'lesson_data': json.dumps({'type': 'image', 'content': '', 'order': config.big_lesson_blocks + 1})}
+        files = {'file': (f'bench_{rng.randrange(1 << 30)}.jpg', upload_body, 'image/jpeg')}
+        return 'POST', f'/lesson/{lesson_id}/data', {'data': data, 'files': files, 'headers': teacher_headers}
+
+    def subscribe(rng):
+        lesson_id = rng.randint(1, config.lessons)
+        return 'POST', f'/lesson/{lesson_id}/subscribe', {'headers': teacher_headers}
+
+    def group_subscribe(rng):
+        # enrolment is owner-only, so only the authenticated teacher's own lessons are targeted
+        lesson_id = rng.choice(seeded.owned_lesson_ids)
+        group_id = rng.choice(seeded.group_ids)
+        return 'POST', f'/lesson/{lesson_id}/subscribe/group/{group_id}', {'headers': teacher_headers}
+
+    def clone(rng):
+        lesson_id = rng.choice(clone_sources)
+        return 'POST', f'/lesson/{lesson_id}/clone', {'headers': teacher_headers}
+
+    def token_create(rng):
+        lesson_id = rng.randint(1, config.lessons)
+        return 'GET', f'/lesson/{lesson_id}/token', {'headers': teacher_headers}
+
+    workloads = [
+        Workload('public_list_deep', public_list_deep),
+        Workload('lesson_data_page', lesson_data_page),
+        Workload('lesson_data_page_editing', lesson_data_page_editing),
+        Workload('lesson_sync', lesson_sync),
+        Workload('upload', upload),
+        Workload('token_create', token_create),
+        Workload('subscribe', subscribe),
+        Workload('clone', clone),
+    ]
+    if seeded.group_ids and seeded.owned_lesson_ids:
+        workloads.append(Workload('group_subscribe', group_subscribe))
+    if video:
+        workloads.insert(3, Workload('media_range', media_range))
+    return workloads
+
+async def run_workload(client, workload: Workload, requests: int, concurrency: int, warmup: int, seed: int):
+    rng = random.Random(f'{seed}:{workload.name}')
+    for _ in range(warmup):
+        method, url, kwargs = workload.build(rng)
+        try:
+            await client.request(method, url, **kwargs)
+        except Exception:
+            pass
+
+    latencies = []
+    errors = 0
+    statuses = {}
+    plan = [workload.build(rng) for _ in range(requests)]
+    queue = asyncio.Queue()
+    for item in plan:
+        queue.put_nowait(item)
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                method, url, kwargs = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                await response.aread()
+                status = response.status_code
+            except Exception as exc:
+                status = type(exc).__name__
+            elapsed = time.perf_counter() - started
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if isinstance(status, int) and status < 400:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    wall_started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - wall_started
+
+    latencies.sort()
+    to_ms = lambda value: None if value is None else round(value * 1000, 3)
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'ok': len(latencies),
+        'errors': errors,
+        'statuses': statuses,
+        'duration_s': round(wall, 4),
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else None,
+        'mean_ms': to_ms(sum(latencies) / len(latencies)) if latencies else None,
+        'p50_ms': to_ms(percentile(latencies, 50)),
+        'p95_ms': to_ms(percentile(latencies, 95)),
+        'p99_ms': to_ms(percentile(latencies, 99)),
+        'max_ms': to_ms(latencies[-1]) if latencies else None,
+    }
@@ -1,30 +1,66 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Depends, BackgroundTasks, Query
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Depends, BackgroundTasks, Query, Request, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from typing import Optional
+from contextlib import asynccontextmanager
+import asyncio
 import json
-import uvicorn
 import mimetypes
 import os
 
 from src.schemas import *
+from src.database.models import MEDIA_TYPES
 import src.database.orm as ORM
 import src.security as Security
 from src.s3_client import S3Client
 from src.redis_client import RedisClient
+from src.container import container, get_s3_client, get_redis_client, get_lesson_events, get_job_queue, get_response_cache
+from src.lesson_events import LessonEventHub, sse_message
+from src.jobs import JobQueue
+from src.response_cache import ResponseCache
+from src.compression import Compression, CompressionMiddleware, compress_with, negotiate
+import src.uploads as Uploads
+from src.server import server_settings, WorkerRecycler
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await container.startup()
+    yield
+    await container.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    # browser editors drive resumable uploads and delta sync from these
+    expose_headers=['Upload-Offset', 'Upload-Length', 'Location', 'X-Lesson-Revision'],
     max_age=3600
 )
 
-s3_client = S3Client()
-redis_client = RedisClient()
+app.add_middleware(CompressionMiddleware)
+
+if server_settings.SERVER_MAX_REQUESTS or server_settings.SERVER_MAX_MEMORY_MB:
+    app.add_middleware(
+        WorkerRecycler,
+        max_requests=server_settings.SERVER_MAX_REQUESTS,
+        max_requests_jitter=server_settings.SERVER_MAX_REQUESTS_JITTER,
+        max_memory_mb=server_settings.SERVER_MAX_MEMORY_MB,
+        check_interval=server_settings.SERVER_MEMORY_CHECK_INTERVAL
+    )
+
+@app.get('/health/live')
+async def health_live():
+    return {'status': 'ok'}
+
+@app.get('/health/ready')
+async def health_ready():
+    checks = await container.readiness()
+    ready = all(status == 'ok' for status in checks.values())
+    return JSONResponse({'status': 'ok' if ready else 'unavailable', 'checks': checks}, status_code=200 if ready else 503)
 
 @app.post('/lesson')
 async def insert_lesson(lesson: LessonListDTO, current_user: dict = Depends(Security.get_current_user)):
@@ -77,7 +113,7 @@ async def get_user_lessons(
     return await ORM.select_user_lessons(current_user.get("id"), title, total_count, page, page_size)
 
 @app.get('/lesson/{index}/token')
-async def get_lesson_token(index: int, current_user: dict = Depends(Security.get_current_user)):
+async def get_lesson_token(index: int, current_user: dict = Depends(Security.get_current_user), redis_client: RedisClient = Depends(get_redis_client)):
     return redis_client.create_token(index)
 
 @app.post("/lesson/{index}/subscribe")
@@ -85,7 +121,7 @@ async def subscribe_lesson(index: int, current_user: dict = Depends(Security.get
     return await ORM.subscribe_lesson(index, current_user.get("id"))
 
 @app.post("/lesson/private/subscribe/{token}")
-async def subscribe_private_lesson(token: str, current_user: dict = Depends(Security.get_current_user)):
+async def subscribe_private_lesson(token: str, current_user: dict = Depends(Security.get_current_user), redis_client: RedisClient = Depends(get_redis_client)):
     lesson_id = redis_client.verify_token(token)
     return await ORM.subscribe_lesson(lesson_id, current_user.get("id"))
 
@@ -93,22 +129,173 @@ async def subscribe_private_lesson(token: str, current_user: dict = Depends(Secu
 async def unsubscribe_lesson(index: int, current_user: dict = Depends(Security.get_current_user)):
     return await ORM.unsubscribe_lesson(index, current_user.get("id"))
 
+def require_teacher(current_user: dict = Depends(Security.get_current_user)):
+    if current_user.get('role') not in ('teacher', 'admin'):
+        raise HTTPException(403, 'Not teacher')
+    return current_user
+
+@app.post("/lesson/{index}/subscribe/group/{group_id}")
+async def subscribe_lesson_group(index: int, group_id: int, current_user: dict = Depends(require_teacher)):
+    return await ORM.subscribe_lesson_group(index, group_id, current_user.get("id"), current_user.get("role") == "admin")
+
+@app.delete("/lesson/{index}/unsubscribe/group/{group_id}")
+async def unsubscribe_lesson_group(index: int, group_id: int, current_user: dict = Depends(require_teacher)):
+    return await ORM.unsubscribe_lesson_group(index, group_id, current_user.get("id"), current_user.get("role") == "admin")
+
+@app.post("/lesson/{index}/subscribe/users")
+async def subscribe_lesson_users(index: int, users: LessonUsersDTO, current_user: dict = Depends(require_teacher)):
+    return await ORM.subscribe_lesson_users(index, users.user_ids, current_user.get("id"), current_user.get("role") == "admin")
+
+# POST rather than DELETE: the user list travels in the body, which many clients and proxies drop on DELETE
+@app.post("/lesson/{index}/unsubscribe/users")
+async def unsubscribe_lesson_users(index: int, users: LessonUsersDTO, current_user: dict = Depends(require_teacher)):
+    return await ORM.unsubscribe_lesson_users(index, users.user_ids, current_user.get("id"), current_user.get("role") == "admin")
+
 @app.delete("/lesson/{index}")
-async def delete_lesson(index: int, current_user: dict = Depends(Security.get_current_user)):
-    return await ORM.delete_lesson(index)
+async def delete_lesson(index: int, current_user: dict = Depends(Security.get_current_user), job_queue: JobQueue = Depends(get_job_queue), response_cache: ResponseCache = Depends(get_response_cache)):
+    result = await ORM.delete_lesson(index)
+    response_cache.invalidate(index)
+    job_queue.enqueue_safely('delete_lesson_media', {'lesson_id': index}, priority=2, idempotency_key=f'delete_lesson_media:{index}', user_id=current_user.get("id"))
+    return result
+
+@app.post("/lesson/{index}/clone")
+async def clone_lesson(index: int, current_user: dict = Depends(require_teacher), s3_client: S3Client = Depends(get_s3_client)):
+    copied = []
+
+    async def copy_media(media: dict[str, str]):
+        # copy_files removes its own partial copies when one of them fails
+        await s3_client.copy_files(media)
+        copied.extend(media.values())
+
+    try:
+        return await ORM.clone_lesson(index, current_user.get("id"), copy_media, current_user.get("role") == "admin")
+    except HTTPException:
+        if copied:
+            await asyncio.to_thread(s3_client.delete_files, copied)
+        raise
 
 @app.post('/lesson/{index}/data')
-async def insert_lesson_data(index: int, lesson_data: str = Form(...), file: Optional[UploadFile] = File(None), current_user: dict = Depends(Security.get_current_user)):
+async def insert_lesson_data(index: int, lesson_data: str = Form(...), file: Optional[UploadFile] = File(None), current_user: dict = Depends(Security.get_current_user), s3_client: S3Client = Depends(get_s3_client), redis_client: RedisClient = Depends(get_redis_client), response_cache: ResponseCache = Depends(get_response_cache)):
     try:
         data_dict = json.loads(lesson_data)
         data = LessonDataDTO(**data_dict)
     except:
         raise HTTPException(status_code=400, detail="Invalid lesson data")
-    if data.type in (LessonDataType.IMAGE, LessonDataType.AUDIO, LessonDataType.VIDEO) and data.content == "":
+    if data.type in MEDIA_TYPES and data.content == "":
         if not file:
             raise HTTPException(status_code=400, detail="Image file is required")
         data.content = await s3_client.upload_media_file(file, data.type.value, index)
-    return await ORM.add_lesson_data(data, index)
+    result = await ORM.add_lesson_data(data, index)
+    response_cache.invalidate(index, result['revision'])
+    redis_client.publish_lesson_event(index, 'insert', {'id': result['id'], 'lesson_id': index, 'revision': result['revision'], **data.model_dump(mode='json')})
+    return result
+
+@app.post('/lesson/{index}/uploads')
+async def create_upload(index: int, upload: UploadCreateDTO, current_user: dict = Depends(Security.get_current_user), s3_client: S3Client = Depends(get_s3_client), redis_client: RedisClient = Depends(get_redis_client)):
+    if upload.type not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Only media can be uploaded")
+    if upload.size > Uploads.UPLOAD_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Upload must not exceed {Uploads.UPLOAD_MAX_SIZE} bytes")
+    await ORM.check_lesson_exists(index)
+    s3_key, s3_upload_id = s3_client.create_multipart_upload(upload.type.value, index, upload.filename)
+    session = {
+        'lesson_id': index,
+        'user_id': current_user.get("id"),
+        'key': s3_key,
+        's3_upload_id': s3_upload_id,
+        'type': upload.type.value,
+        'order': upload.order,
+        'size': upload.size,
+        'chunk_size': Uploads.chunk_size_for(upload.size)
+    }
+    upload_id = redis_client.create_upload_session(session, Uploads.UPLOAD_SESSION_TTL)
+    return JSONResponse(
+        Uploads.upload_status(upload_id, session, {}),
+        status_code=201,
+        headers={'Location': f'/lesson/uploads/{upload_id}'}
+    )
+
+def get_own_upload_session(upload_id: str, current_user: dict, redis_client: RedisClient):
+    session = redis_client.get_upload_session(upload_id)
+    if session['user_id'] != current_user.get("id"):
+        raise HTTPException(status_code=403, detail="Not upload owner")
+    return session
+
+@app.head('/lesson/uploads/{upload_id}')
+async def head_upload(upload_id: str, current_user: dict = Depends(Security.get_current_user), redis_client: RedisClient = Depends(get_redis_client)):
+    session = get_own_upload_session(upload_id, current_user, redis_client)
+    parts = redis_client.get_upload_parts(upload_id)
+    return Response(headers={
+        'Upload-Offset': str(Uploads.contiguous_offset(session, parts)),
+        'Upload-Length': str(session['size']),
+        'Cache-Control': 'no-store'
+    })
+
+@app.get('/lesson/uploads/{upload_id}')
+async def get_upload(upload_id: str, current_user: dict = Depends(Security.get_current_user), redis_client: RedisClient = Depends(get_redis_client)):
+    session = get_own_upload_session(upload_id, current_user, redis_client)
+    return Uploads.upload_status(upload_id, session, redis_client.get_upload_parts(upload_id))
+
+@app.patch('/lesson/uploads/{upload_id}')
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(...),
+    current_user: dict = Depends(Security.get_current_user),
+    s3_client: S3Client = Depends(get_s3_client),
+    redis_client: RedisClient = Depends(get_redis_client)
+):
+    session = get_own_upload_session(upload_id, current_user, redis_client)
+    part_number = Uploads.part_for_offset(session, upload_offset)
+    if not part_number:
+        parts = redis_client.get_upload_parts(upload_id)
+        raise HTTPException(
+            status_code=409,
+            detail="Offset must be a chunk boundary inside the upload",
+            headers={'Upload-Offset': str(Uploads.contiguous_offset(session, parts))}
+        )
+    async with Uploads.part_buffer():
+        body = await Uploads.read_part(request, Uploads.part_length(session, part_number))
+        etag = await s3_client.upload_part(session['key'], session['s3_upload_id'], part_number, body)
+    redis_client.add_upload_part(upload_id, part_number, etag, Uploads.UPLOAD_SESSION_TTL)
+    parts = redis_client.get_upload_parts(upload_id)
+    return Response(status_code=204, headers={'Upload-Offset': str(Uploads.contiguous_offset(session, parts))})
+
+@app.post('/lesson/uploads/{upload_id}/complete')
+async def complete_upload(upload_id: str, current_user: dict = Depends(Security.get_current_user), s3_client: S3Client = Depends(get_s3_client), redis_client: RedisClient = Depends(get_redis_client), job_queue: JobQueue = Depends(get_job_queue), response_cache: ResponseCache = Depends(get_response_cache)):
+    session = get_own_upload_session(upload_id, current_user, redis_client)
+    parts = redis_client.get_upload_parts(upload_id)
+    if len(parts) != Uploads.part_count(session):
+        raise HTTPException(status_code=409, detail=Uploads.upload_status(upload_id, session, parts))
+    if not redis_client.lock_upload_session(upload_id, Uploads.UPLOAD_SESSION_TTL):
+        raise HTTPException(status_code=409, detail="Upload is already being completed")
+    try:
+        await s3_client.complete_multipart_upload(session['key'], session['s3_upload_id'], parts)
+    except HTTPException:
+        redis_client.unlock_upload_session(upload_id)
+        raise
+    data = LessonDataDTO(type=session['type'], content=session['key'], order=session['order'])
+    try:
+        result = await ORM.add_lesson_data(data, session['lesson_id'])
+    except HTTPException:
+        job_queue.enqueue_safely('delete_file', {'key': session['key']}, user_id=current_user.get("id"))
+        # S3 has already completed the multipart upload, so a retry of this session could only fail
+        redis_client.delete_upload_session(upload_id)
+        raise
+    redis_client.delete_upload_session(upload_id)
+    response_cache.invalidate(session['lesson_id'], result['revision'])
+    redis_client.publish_lesson_event(session['lesson_id'], 'insert', {'id': result['id'], 'lesson_id': session['lesson_id'], 'revision': result['revision'], **data.model_dump(mode='json')})
+    return result
+
+@app.delete('/lesson/uploads/{upload_id}')
+async def abort_upload(upload_id: str, current_user: dict = Depends(Security.get_current_user), s3_client: S3Client = Depends(get_s3_client), redis_client: RedisClient = Depends(get_redis_client)):
+    session = get_own_upload_session(upload_id, current_user, redis_client)
+    s3_client.abort_multipart_upload(session['key'], session['s3_upload_id'])
+    redis_client.delete_upload_session(upload_id)
+    return {'message': 'Upload aborting successfully'}
+
+# pages are served from the response cache, so the stronger levels are paid once per revision and encoding
+LESSON_DATA_COMPRESSION = Compression(gzip=9, br=9, zstd=12)
 
 @app.get("/lesson/{index}/data")
 async def get_lesson_data(
@@ -116,37 +303,95 @@ async def get_lesson_data(
     total_count: Optional[int] = Query(None),
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
-    is_editing: bool = Query(False)
+    is_editing: bool = Query(False),
+    accept_encoding: Optional[str] = Header(None),
+    response_cache: ResponseCache = Depends(get_response_cache)
 ):
-    return await ORM.select_lesson_data(index, total_count, page, page_size, is_editing)
+    # a client-supplied total_count shapes the body, so only the counted variant is cached;
+    # keying on it would let clients create variants without bound
+    cacheable = not total_count
+    variant = f'{page}:{page_size}:{int(is_editing)}'
+    encoding = negotiate(accept_encoding)
+    revision, body, encoded = response_cache.get(index, variant, encoding) if cacheable else (None, None, None)
+    headers = {'Vary': 'Accept-Encoding', 'X-Cache': 'HIT'}
+    bodies = {}
+    if body is None:
+        result = await ORM.select_lesson_data(index, total_count, page, page_size, is_editing)
+        revision = result['revision']
+        body = bodies['identity'] = JSONResponse(jsonable_encoder(result)).body
+        headers['X-Cache'] = 'MISS' if cacheable else 'BYPASS'
+        # pages past the end are all alike and unbounded in number
+        cacheable = cacheable and (page == 1 or bool(result['data']))
+    if encoding is not None and encoded is None and len(body) >= LESSON_DATA_COMPRESSION.minimum_size:
+        encoded = bodies[encoding] = await LESSON_DATA_COMPRESSION.compress_async(body, encoding)
+    if bodies and cacheable:
+        response_cache.store(index, revision, variant, bodies)
+    if encoded is not None:
+        headers['Content-Encoding'] = encoding
+        return Response(encoded, media_type='application/json', headers=headers)
+    return Response(body, media_type='application/json', headers=headers)
+
+# polled by every client after a reconnect, so it favours speed over ratio
+@app.get("/lesson/{index}/sync", dependencies=[Depends(compress_with(Compression(gzip=1, br=1, zstd=1)))])
+async def get_lesson_changes(index: int, since: int = Query(0, ge=0)):
+    return await ORM.select_lesson_changes(index, since)
+
+@app.get("/lesson/{index}/events")
+async def get_lesson_events_stream(index: int, lesson_events: LessonEventHub = Depends(get_lesson_events)):
+    async def stream():
+        async with lesson_events.listen(index) as queue:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), 15)
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+                    continue
+                if event is None:
+                    return
+                yield sse_message(event)
+
+    return StreamingResponse(stream(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.put("/lesson/{index}/data/{data_index}")
-async def update_lesson_data(index: int, data_index: int, lesson_data: str = Form(...), file: Optional[UploadFile] = File(None)):
+async def update_lesson_data(index: int, data_index: int, lesson_data: str = Form(...), file: Optional[UploadFile] = File(None), s3_client: S3Client = Depends(get_s3_client), redis_client: RedisClient = Depends(get_redis_client), job_queue: JobQueue = Depends(get_job_queue), response_cache: ResponseCache = Depends(get_response_cache)):
     try:
         data_dict = json.loads(lesson_data)
         data = LessonDataUpdateDTO(**data_dict)
     except:
         raise HTTPException(status_code=400, detail="Invalid lesson data")
-    if data.type in (LessonDataType.IMAGE, LessonDataType.AUDIO, LessonDataType.VIDEO) and data.content == "":
+    if data.type in MEDIA_TYPES and data.content == "":
         if not file:
             raise HTTPException(status_code=400, detail="Image file is required")
         data.content = await s3_client.upload_media_file(file, data.type.value, index)
 
     result = await ORM.update_lesson_data(data, index, data_index)
+    response_cache.invalidate(index, result['revision'])
+    redis_client.publish_lesson_event(index, 'update', {**data.model_dump(mode='json'), 'id': data_index, 'lesson_id': index, 'revision': result['revision']})
     if 'delete_file' in result:
-        s3_client.delete_file(result['delete_file'], True)
-        result.pop('delete_file')
+        job_queue.enqueue_safely('delete_file', {'key': result.pop('delete_file')})
     return result
 
 @app.delete("/lesson/{index}/data/{data_index}")
-async def delete_lesson_data(index: int, data_index: int, current_user: dict = Depends(Security.get_current_user)):
+async def delete_lesson_data(index: int, data_index: int, current_user: dict = Depends(Security.get_current_user), redis_client: RedisClient = Depends(get_redis_client), job_queue: JobQueue = Depends(get_job_queue), response_cache: ResponseCache = Depends(get_response_cache)):
     result = await ORM.delete_lesson_data(data_index)
+    response_cache.invalidate(result['lesson_id'], result['revision'])
+    redis_client.publish_lesson_event(result['lesson_id'], 'delete', {'id': data_index, 'lesson_id': result['lesson_id'], 'revision': result['revision']})
     if 'delete_file' in result:
-        s3_client.delete_file(result["delete_file"], True)
-    return result["message"]
+        job_queue.enqueue_safely('delete_file', {'key': result['delete_file']}, user_id=current_user.get("id"))
+    # the body stays the bare message existing clients expect; the revision rides in a header
+    return JSONResponse(result['message'], headers={'X-Lesson-Revision': str(result['revision'])})
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, current_user: dict = Depends(Security.get_current_user), job_queue: JobQueue = Depends(get_job_queue)):
+    job = job_queue.get(job_id)
+    # payloads carry S3 keys; jobs enqueued without a user are visible to admins only
+    if current_user.get("role") != "admin" and job['user_id'] != current_user.get("id"):
+        raise HTTPException(status_code=403, detail="Not job owner")
+    return job
 
 @app.get("/image/{lesson_id}/{filename}")
-async def get_image(lesson_id: str, filename: str, background_tasks: BackgroundTasks):
+async def get_image(lesson_id: str, filename: str, background_tasks: BackgroundTasks, s3_client: S3Client = Depends(get_s3_client)):
     local_file_path = s3_client.get_file("image", lesson_id, filename)
     media_type, _ = mimetypes.guess_type(filename)
     if not media_type:
@@ -155,7 +400,7 @@ async def get_image(lesson_id: str, filename: str, background_tasks: BackgroundT
     return FileResponse(local_file_path, media_type=media_type)
 
 @app.get("/audio/{lesson_id}/{filename}")
-async def get_audio(lesson_id: str, filename: str, background_tasks: BackgroundTasks):
+async def get_audio(lesson_id: str, filename: str, background_tasks: BackgroundTasks, s3_client: S3Client = Depends(get_s3_client)):
     local_file_path = s3_client.get_file("audio", lesson_id, filename)
     media_type, _ = mimetypes.guess_type(filename)
     if not media_type:
@@ -164,7 +409,7 @@ async def get_audio(lesson_id: str, filename: str, background_tasks: BackgroundT
     return FileResponse(local_file_path, media_type=media_type)
 
 @app.get("/video/{lesson_id}/{filename}")
-async def get_video(lesson_id: str, filename: str, background_tasks: BackgroundTasks):
+async def get_video(lesson_id: str, filename: str, background_tasks: BackgroundTasks, s3_client: S3Client = Depends(get_s3_client)):
     local_file_path = s3_client.get_file("video", lesson_id, filename)
     media_type, _ = mimetypes.guess_type(filename)
     if not media_type:
@@ -180,4 +425,5 @@ def delete_file(path: str):
         pass
 
 if __name__ == '__main__':
+    import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
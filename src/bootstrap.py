@@ -0,0 +1,12 @@
+from src.s3_client import S3Client
+from src.uploads import UPLOAD_ABORT_AFTER_DAYS
+
+def main():
+    s3_client = S3Client()
+    s3_client.ensure_buckets_exist()
+    # chunked upload sessions expire in Redis; S3 drops their parts once the upload is this old
+    s3_client.ensure_multipart_cleanup(UPLOAD_ABORT_AFTER_DAYS)
+    print(f'Bucket {s3_client.bucket} is ready')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import asyncio
+import gzip
+from dataclasses import dataclass
+
+from fastapi import Request
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+class CompressionSettings(BaseSettings):
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_LEVEL: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+
+    model_config = SettingsConfigDict(env_file='.env', extra='ignore')
+
+compression_settings = CompressionSettings()
+
+@dataclass(frozen=True)
+class Compression:
+    gzip: int = compression_settings.COMPRESSION_GZIP_LEVEL
+    br: int = compression_settings.COMPRESSION_BROTLI_LEVEL
+    zstd: int = compression_settings.COMPRESSION_ZSTD_LEVEL
+    minimum_size: int = compression_settings.COMPRESSION_MINIMUM_SIZE
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.br)
+        if encoding == 'zstd':
+            return zstandard.ZstdCompressor(level=self.zstd).compress(body)
+        return gzip.compress(body, compresslevel=self.gzip, mtime=0)
+
+    async def compress_async(self, body: bytes, encoding: str) -> bytes:
+        # large payloads at high levels take milliseconds of CPU, which would stall every request on the loop
+        if len(body) > 64 * 1024:
+            return await asyncio.to_thread(self.compress, body, encoding)
+        return self.compress(body, encoding)
+
+default_compression = Compression()
+
+# server preference when the client weights several encodings equally
+ENCODINGS = tuple(encoding for encoding, available in (('br', brotli), ('zstd', zstandard), ('gzip', gzip)) if available)
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+def negotiate(accept_encoding: str | None) -> str | None:
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def is_compressible(content_type: str | None) -> bool:
+    if not content_type:
+        return False
+    media_type = content_type.split(';')[0].strip().lower()
+    if media_type == 'text/event-stream':
+        return False
+    return media_type.startswith('text/') or media_type in COMPRESSIBLE_TYPES or media_type.endswith('+json')
+
+def compress_with(compression: Compression):
+    """Route dependency that overrides the compression levels used for its response."""
+
+    def dependency(request: Request):
+        request.state.compression = compression
+    return dependency
+
+class CompressionMiddleware:
+    """Compresses complete text and JSON responses with the best encoding the client accepts.
+
+    Streaming responses (SSE, media files) and responses that already carry a
+    Content-Encoding, such as cached precompressed bodies, pass through untouched."""
+
+    def __init__(self, app, compression: Compression = default_compression):
+        self.app = app
+        self.compression = compression
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        encoding = negotiate(Headers(scope=scope).get('accept-encoding'))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        # created up front so that request.state set by a route lands in this same dict
+        state = scope.setdefault('state', {})
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                headers = Headers(raw=message['headers'])
+                if message['status'] in (204, 206, 304) or 'content-encoding' in headers or not is_compressible(headers.get('content-type')):
+                    await send(message)
+                else:
+                    start = message
+                return
+            if message['type'] != 'http.response.body' or start is None:
+                await send(message)
+                return
+
+            pending, start = start, None
+            body = message.get('body', b'')
+            compression = state.get('compression', self.compression)
+            if message.get('more_body', False) or len(body) < compression.minimum_size:
+                await send(pending)
+                await send(message)
+                return
+            body = await compression.compress_async(body, encoding)
+            headers = MutableHeaders(raw=pending['headers'])
+            headers['Content-Encoding'] = encoding
+            headers['Content-Length'] = str(len(body))
+            headers.add_vary_header('Accept-Encoding')
+            await send(pending)
+            await send({'type': 'http.response.body', 'body': body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,88 @@
+import asyncio
+from sqlalchemy import text
+
+from src.database.core import engine
+from src.s3_client import S3Client
+from src.redis_client import RedisClient
+from src.lesson_events import LessonEventHub
+from src.jobs import JobQueue
+from src.response_cache import ResponseCache
+from src.server import on_shutdown_signal
+import src.tasks  # noqa: F401 - registers the job types the API enqueues
+
+class Container:
+    def __init__(self, check_timeout: float = 2.0):
+        self.check_timeout = check_timeout
+        self.s3_client: S3Client | None = None
+        self.redis_client: RedisClient | None = None
+        self.lesson_events: LessonEventHub | None = None
+        self.job_queue: JobQueue | None = None
+        self.response_cache: ResponseCache | None = None
+        self.restore_signals = lambda: None
+
+    async def startup(self):
+        self.s3_client = await asyncio.to_thread(S3Client)
+        self.redis_client = RedisClient()
+        self.job_queue = JobQueue(self.redis_client.client)
+        self.response_cache = ResponseCache(self.redis_client.host, self.redis_client.port, self.redis_client.db)
+        self.lesson_events = LessonEventHub(self.redis_client.host, self.redis_client.port, self.redis_client.db)
+        self.lesson_events.start()
+        # open event streams would otherwise hold the worker for the whole graceful timeout
+        self.restore_signals = on_shutdown_signal(self.lesson_events.end_streams)
+
+    async def shutdown(self):
+        # repeated in-process lifespans would otherwise stack handlers bound to closed loops
+        self.restore_signals()
+        if self.lesson_events is not None:
+            await self.lesson_events.close()
+        if self.response_cache is not None:
+            self.response_cache.close()
+        if self.redis_client is not None:
+            self.redis_client.close()
+        await engine.dispose()
+
+    async def _check_database(self):
+        async with engine.connect() as conn:
+            await conn.execute(text('SELECT 1'))
+
+    async def _check_redis(self):
+        await asyncio.to_thread(self.redis_client.client.ping)
+
+    async def _check_s3(self):
+        await asyncio.to_thread(self.s3_client.client.head_bucket, Bucket=self.s3_client.bucket)
+
+    async def readiness(self) -> dict:
+        checks = {
+            'database': self._check_database,
+            'redis': self._check_redis,
+            's3': self._check_s3,
+        }
+
+        async def run(check):
+            try:
+                await asyncio.wait_for(check(), self.check_timeout)
+                return 'ok'
+            except Exception as e:
+                return f'error: {type(e).__name__}'
+
+        if self.s3_client is None or self.redis_client is None:
+            return {name: 'not started' for name in checks}
+        results = await asyncio.gather(*(run(check) for check in checks.values()))
+        return dict(zip(checks, results))
+
+container = Container()
+
+def get_s3_client() -> S3Client:
+    return container.s3_client
+
+def get_redis_client() -> RedisClient:
+    return container.redis_client
+
+def get_lesson_events() -> LessonEventHub:
+    return container.lesson_events
+
+def get_job_queue() -> JobQueue:
+    return container.job_queue
+
+def get_response_cache() -> ResponseCache:
+    return container.response_cache
@@ -6,9 +6,12 @@ class Settings(BaseSettings):
     DB_USER: str
     DB_PASS: str
     DB_NAME: str
+    DB_ECHO: bool = True
 
     @property
     def DATABASE_URL(self):
+        if self.DB_HOST.startswith('/'):
+            return f'postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@/{self.DB_NAME}?host={self.DB_HOST}&port={self.DB_PORT}'
         return f'postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}'
     
     model_config = SettingsConfigDict(env_file='.env')
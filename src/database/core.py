@@ -3,7 +3,7 @@ from src.database.config import settings
 
 engine = create_async_engine(
     url=settings.DATABASE_URL,
-    echo=True,
+    echo=settings.DB_ECHO,
 )
 
 session = async_sessionmaker(bind=engine, expire_on_commit=False)
\ No newline at end of file
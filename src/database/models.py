@@ -1,5 +1,5 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import ForeignKey, Enum as SQLAlchemyEnum, String, PrimaryKeyConstraint
+from sqlalchemy import ForeignKey, Enum as SQLAlchemyEnum, String, PrimaryKeyConstraint, Index
 from typing import Annotated
 from datetime import datetime
 from enum import Enum
@@ -17,6 +17,8 @@ class LessonDataType(str, Enum):
     HEADER = 'header'
     CODE = 'code'
 
+MEDIA_TYPES = (LessonDataType.IMAGE, LessonDataType.AUDIO, LessonDataType.VIDEO)
+
 class UserRole(str, Enum):
     STUDENT = 'student'
     TEACHER = 'teacher'
@@ -50,8 +52,9 @@ class LessonList(Base):
     title: Mapped[str_nn]
     description: Mapped[str | None] = mapped_column(String, nullable=True)
     private_access: Mapped[bool] = mapped_column()
-    created_at: Mapped[datetime] = mapped_column(default=datetime.now())
-    updated_at: Mapped[datetime] = mapped_column(default=datetime.now(), onupdate=datetime.now())
+    created_at: Mapped[datetime] = mapped_column(default=datetime.now)
+    updated_at: Mapped[datetime] = mapped_column(default=datetime.now, onupdate=datetime.now)
+    revision: Mapped[int] = mapped_column(default=1, server_default='1')
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete='CASCADE'))
     
     users = relationship("UserList", secondary="user_lesson", back_populates="lessons")
@@ -64,6 +67,22 @@ class LessonData(Base):
     type: Mapped[LessonDataType] = mapped_column(SQLAlchemyEnum(LessonDataType))
     content: Mapped[str_nn]
     order: Mapped[int] = mapped_column(nullable=False)
+    revision: Mapped[int] = mapped_column(default=1, server_default='1')
+
+    __table_args__ = (
+        Index('ix_lesson_data_lesson_revision', 'lesson_id', 'revision'),
+    )
+
+class LessonDataTombstone(Base):
+    __tablename__ = 'lesson_data_tombstone'
+
+    data_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    lesson_id: Mapped[int] = mapped_column(ForeignKey("lessons.id", ondelete='CASCADE'))
+    revision: Mapped[int] = mapped_column(nullable=False)
+
+    __table_args__ = (
+        Index('ix_lesson_data_tombstone_lesson_revision', 'lesson_id', 'revision'),
+    )
 
 class UserLesson(Base):
     __tablename__ = 'user_lesson'
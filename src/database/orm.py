@@ -1,21 +1,13 @@
 from fastapi import HTTPException
-from sqlalchemy import select, delete, insert, and_, func, over, inspect, text, create_engine
-from sqlalchemy.orm import joinedload
+from sqlalchemy import select, delete, update, and_, or_, func, literal, case, any_, Integer
+from sqlalchemy.dialects.postgresql import insert, ARRAY
 from sqlalchemy.exc import IntegrityError
-from datetime import datetime
-from collections import defaultdict
 from typing import Optional
-import os
 
-from src.database.core import session, settings, create_async_engine
+from src.database.core import session
 from src.database.models import *
 from src.schemas import *
 
-from alembic.config import Config
-from alembic import command
-from alembic.script import ScriptDirectory
-from alembic.runtime.environment import EnvironmentContext
-
 async def insert_lesson(lessonDTO: LessonListDTO, user_id):
     try:
         async with session() as s:
@@ -185,15 +177,89 @@ async def delete_lesson(index: int):
         s.rollback()
         raise HTTPException(status_code=500, detail='Error deleting lesson')
 
-async def add_lesson_data(lesson_data: LessonDataDTO, lesson_id: int):
+async def clone_lesson(index: int, user_id: int, copy_media, is_admin: bool = False):
     try:
         async with session() as s:
+            filters = [LessonList.id == index]
+            if not is_admin:
+                filters.append(or_(LessonList.private_access == False, LessonList.user_id == user_id))
+            lesson_query = (
+                insert(LessonList)
+                .from_select(
+                    ['title', 'description', 'private_access', 'created_at', 'updated_at', 'user_id'],
+                    select(
+                        LessonList.title,
+                        LessonList.description,
+                        LessonList.private_access,
+                        func.now(),
+                        func.now(),
+                        literal(user_id)
+                    ).filter(and_(*filters))
+                )
+                .returning(LessonList.id)
+            )
+            new_id = (await s.execute(lesson_query)).scalar()
+            if new_id is None:
+                raise HTTPException(status_code=404, detail='Lesson not found')
+
+            # media keys look like "{type}/{lesson_id}/{filename}"; the copy gets the new lesson id
+            is_media = and_(LessonData.type.in_(MEDIA_TYPES), ~LessonData.content.startswith('http'))
+            cloned_content = func.regexp_replace(LessonData.content, '^([^/]+)/[^/]+/', f'\\1/{new_id}/')
+            media_query = (
+                select(LessonData.content, cloned_content)
+                .filter(and_(LessonData.lesson_id == index, is_media))
+                .distinct()
+            )
+            media = {old: new for old, new in await s.execute(media_query) if old != new}
 
+            data_query = insert(LessonData).from_select(
+                ['lesson_id', 'type', 'content', 'order'],
+                select(
+                    literal(new_id),
+                    LessonData.type,
+                    case((is_media, cloned_content), else_=LessonData.content),
+                    LessonData.order
+                )
+                .filter(LessonData.lesson_id == index)
+                .order_by(LessonData.id)
+            )
+            await s.execute(data_query)
+            # the objects are copied while the clone is still uncommitted, so no reader ever sees rows
+            # pointing at missing media, and a process dying mid-copy leaves no clone behind
+            await copy_media(media)
+            await s.commit()
+            return {'message': 'Lesson cloning successfully', 'id': new_id}
+    except HTTPException:
+        raise
+    except:
+        await s.rollback()
+        raise HTTPException(status_code=500, detail='Error cloning lesson')
+
+async def _next_revision(s, lesson_id: int) -> int:
+    # the row lock on the lesson serializes writers, so revisions are strictly increasing per lesson
+    query = (
+        update(LessonList)
+        .filter(LessonList.id == lesson_id)
+        .values(revision=LessonList.revision + 1)
+        .returning(LessonList.revision)
+    )
+    revision = (await s.execute(query)).scalar()
+    if revision is None:
+        raise HTTPException(status_code=404, detail='Lesson not found')
+    return revision
+
+async def add_lesson_data(lesson_data: LessonDataDTO, lesson_id: int):
+    try:
+        async with session() as s:
+            revision = await _next_revision(s, lesson_id)
             data = LessonData(**lesson_data.model_dump())
             data.lesson_id = lesson_id
+            data.revision = revision
             s.add(data)
             await s.commit()
-            return {'message': 'Lesson data inserting successfully'}
+            return {'message': 'Lesson data inserting successfully', 'id': data.id, 'revision': revision}
+    except HTTPException:
+        raise
     except IntegrityError:
         await s.rollback()
         raise HTTPException(status_code=500, detail='Lesson data already exists')
@@ -204,13 +270,12 @@ async def add_lesson_data(lesson_data: LessonDataDTO, lesson_id: int):
 async def subscribe_lesson(lesson_id: int, user_id: int):
     try:
         async with session() as s:
-            data = UserLesson(user_id=user_id, lesson_id=lesson_id)
-            s.add(data)
+            query = insert(UserLesson).values(user_id=user_id, lesson_id=lesson_id).on_conflict_do_nothing()
+            result = await s.execute(query)
             await s.commit()
+            if result.rowcount == 0:
+                return {'message': 'Lesson user already exists'}
             return {'message': 'Lesson user inserting successfully'}
-    except IntegrityError:
-        await s.rollback()
-        raise HTTPException(status_code=500, detail="Lesson user already exists")
     except:
         await s.rollback()
         raise HTTPException(status_code=500, detail="Error inserting lesson user")
@@ -226,6 +291,77 @@ async def unsubscribe_lesson(lesson_id: int, user_id: int):
         await s.rollback()
         raise HTTPException(status_code=500, detail="Error inserting lesson user")
 
+async def check_lesson_exists(lesson_id: int):
+    async with session() as s:
+        if (await s.execute(select(LessonList.id).filter(LessonList.id == lesson_id))).scalar() is None:
+            raise HTTPException(status_code=404, detail='Lesson not found')
+
+async def _check_lesson_owner(s, lesson_id: int, user_id: int, is_admin: bool):
+    owner_id = (await s.execute(select(LessonList.user_id).filter(LessonList.id == lesson_id))).scalar()
+    if owner_id is None:
+        raise HTTPException(status_code=404, detail='Lesson not found')
+    if not is_admin and owner_id != user_id:
+        raise HTTPException(status_code=403, detail='Not lesson owner')
+
+async def _subscribe_from_select(lesson_id: int, users_query, user_id: int, is_admin: bool):
+    try:
+        async with session() as s:
+            await _check_lesson_owner(s, lesson_id, user_id, is_admin)
+            query = (
+                insert(UserLesson)
+                .from_select(['user_id', 'lesson_id'], users_query)
+                .on_conflict_do_nothing()
+            )
+            result = await s.execute(query)
+            await s.commit()
+            return {'message': 'Lesson users inserting successfully', 'count': result.rowcount}
+    except HTTPException:
+        raise
+    except IntegrityError:
+        await s.rollback()
+        raise HTTPException(status_code=404, detail="Lesson not found")
+    except:
+        await s.rollback()
+        raise HTTPException(status_code=500, detail="Error inserting lesson users")
+
+async def _unsubscribe_where(lesson_id: int, user_id: int, is_admin: bool, *filters):
+    try:
+        async with session() as s:
+            await _check_lesson_owner(s, lesson_id, user_id, is_admin)
+            query = delete(UserLesson).filter(and_(UserLesson.lesson_id == lesson_id, *filters))
+            result = await s.execute(query)
+            await s.commit()
+            return {'message': 'Lesson users deleting successfully', 'count': result.rowcount}
+    except HTTPException:
+        raise
+    except:
+        await s.rollback()
+        raise HTTPException(status_code=500, detail="Error deleting lesson users")
+
+async def subscribe_lesson_group(lesson_id: int, group_id: int, user_id: int, is_admin: bool = False):
+    users_query = select(UserGroup.user_id, literal(lesson_id)).filter(UserGroup.group_id == group_id).order_by(UserGroup.user_id)
+    return await _subscribe_from_select(lesson_id, users_query, user_id, is_admin)
+
+async def unsubscribe_lesson_group(lesson_id: int, group_id: int, user_id: int, is_admin: bool = False):
+    return await _unsubscribe_where(
+        lesson_id,
+        user_id,
+        is_admin,
+        UserLesson.user_id == UserGroup.user_id,
+        UserGroup.group_id == group_id
+    )
+
+def _id_array(ids: list[int]):
+    # one array parameter instead of one per id, which asyncpg caps at 32767
+    return any_(literal(ids, ARRAY(Integer)))
+
+async def subscribe_lesson_users(lesson_id: int, user_ids: list[int], user_id: int, is_admin: bool = False):
+    users_query = select(UserList.id, literal(lesson_id)).filter(UserList.id == _id_array(user_ids)).order_by(UserList.id)
+    return await _subscribe_from_select(lesson_id, users_query, user_id, is_admin)
+
+async def unsubscribe_lesson_users(lesson_id: int, user_ids: list[int], user_id: int, is_admin: bool = False):
+    return await _unsubscribe_where(lesson_id, user_id, is_admin, UserLesson.user_id == _id_array(user_ids))
+
 async def select_lesson_headers(lesson_id: int, page_size: int = 100):
     async with session() as s:
         subq = (
@@ -266,6 +402,10 @@ async def select_lesson_headers(lesson_id: int, page_size: int = 100):
 
 async def select_lesson_data(lesson_id: int, total_count: Optional[int] = None, page: int = 1, page_size: int = 100, is_editing: bool = False):
     async with session() as s:
+        # read the lesson first so the returned revision never runs ahead of the returned blocks
+        teacher_query = select(LessonList).filter(LessonList.id == lesson_id)
+        teacher_result = await s.execute(teacher_query)
+        teacher = teacher_result.scalars().first()
 
         query = select(LessonData).filter(LessonData.lesson_id == lesson_id).offset((page - 1) * page_size).limit(page_size).order_by(LessonData.order)
         result = await s.execute(query)
@@ -309,15 +449,13 @@ async def select_lesson_data(lesson_id: int, total_count: Optional[int] = None,
                 next_item = LessonDataReadDTO.model_validate(next_item_obj)
 
         headers = await select_lesson_headers(lesson_id, page_size)
-        teacher_query = select(LessonList).filter(LessonList.id == lesson_id)
-        teacher_result = await s.execute(teacher_query)
-        teacher = teacher_result.scalars().first()
 
         return {
             'data': lessons_dto,
             'total_count': total_count,
             'headers': headers,
             'teacher_id': teacher.user_id,
+            'revision': teacher.revision,
             'boundary': {
                 'prev': prev_item,
                 'next': next_item
@@ -325,6 +463,35 @@ async def select_lesson_data(lesson_id: int, total_count: Optional[int] = None,
         } 
         
     
+async def select_lesson_changes(lesson_id: int, since: int):
+    async with session() as s:
+        revision = (await s.execute(select(LessonList.revision).filter(LessonList.id == lesson_id))).scalar()
+        if revision is None:
+            raise HTTPException(status_code=404, detail='Lesson not found')
+        if since > revision:
+            return {'revision': revision, 'reset': True, 'data': [], 'deleted': []}
+
+        data_query = (
+            select(LessonData)
+            .filter(and_(LessonData.lesson_id == lesson_id, LessonData.revision > since, LessonData.revision <= revision))
+            .order_by(LessonData.revision, LessonData.id)
+        )
+        data = (await s.execute(data_query)).scalars().all()
+
+        deleted_query = (
+            select(LessonDataTombstone.data_id)
+            .filter(and_(LessonDataTombstone.lesson_id == lesson_id, LessonDataTombstone.revision > since, LessonDataTombstone.revision <= revision))
+            .order_by(LessonDataTombstone.revision)
+        )
+        deleted = (await s.execute(deleted_query)).scalars().all()
+
+        return {
+            'revision': revision,
+            'reset': False,
+            'data': [LessonDataReadDTO.model_validate(item) for item in data],
+            'deleted': deleted
+        }
+
 async def delete_lesson_data(data_index: int):
     try:
         async with session() as s:
@@ -332,17 +499,21 @@ async def delete_lesson_data(data_index: int):
             lesson_data = result.scalars().first()
             if lesson_data is None:
                 raise HTTPException(status_code=404, detail="Lesson data not found")
-            result = {'message': 'Lesson data deleting successfully'}
-            if (lesson_data.type in (LessonDataType.IMAGE, LessonDataType.AUDIO, LessonDataType.VIDEO) and not lesson_data.content.startswith("http")):
+            revision = await _next_revision(s, lesson_data.lesson_id)
+            result = {'message': 'Lesson data deleting successfully', 'lesson_id': lesson_data.lesson_id, 'revision': revision}
+            if (lesson_data.type in MEDIA_TYPES and not lesson_data.content.startswith("http")):
                 result['delete_file'] = lesson_data.content
                 
 
             query = delete(LessonData).filter(LessonData.id == data_index)
             await s.execute(query)
+            s.add(LessonDataTombstone(data_id=data_index, lesson_id=lesson_data.lesson_id, revision=revision))
             await s.commit()
             return result
+    except HTTPException:
+        raise
     except:
-        s.rollback()
+        await s.rollback()
         raise HTTPException(status_code=500, detail='Error deleting lesson data')
     
 async def update_lesson_data(lesson_data: LessonDataUpdateDTO, lesson_id: int, index: int):
@@ -352,7 +523,8 @@ async def update_lesson_data(lesson_data: LessonDataUpdateDTO, lesson_id: int, i
             if not data or data.lesson_id != lesson_id:
                 raise HTTPException(status_code=404, detail="Lesson data not found")
             
-            result = {'message': 'Lesson data updating successfully'}
+            revision = await _next_revision(s, lesson_id)
+            result = {'message': 'Lesson data updating successfully', 'revision': revision}
             if data.type == 'image' and not lesson_data.content.startswith("http") and data.content != lesson_data.content:
                 result["delete_file"] = data.content
                 result["filename"] = lesson_data.content
@@ -360,12 +532,15 @@ async def update_lesson_data(lesson_data: LessonDataUpdateDTO, lesson_id: int, i
             data.order = lesson_data.order
             data.content = lesson_data.content
             data.type = lesson_data.type
+            data.revision = revision
 
             await s.commit()
 
             await s.refresh(data)
 
             return result
+    except HTTPException:
+        raise
     except:
-        s.rollback()
+        await s.rollback()
         raise HTTPException(status_code=500, detail='Error updating lesson data')
\ No newline at end of file
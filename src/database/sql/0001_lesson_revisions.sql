@@ -0,0 +1,21 @@
+-- Per-lesson revisions and tombstones for GET /lesson/{index}/sync?since=.
+-- Idempotent, so it can run against a database that already has part of it;
+-- mirror it in an Alembic revision under script_location when one is generated.
+BEGIN;
+
+ALTER TABLE lessons ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE lesson_data ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 1;
+
+CREATE INDEX IF NOT EXISTS ix_lesson_data_lesson_revision ON lesson_data (lesson_id, revision);
+
+CREATE TABLE IF NOT EXISTS lesson_data_tombstone (
+    data_id INTEGER NOT NULL,
+    lesson_id INTEGER NOT NULL,
+    revision INTEGER NOT NULL,
+    PRIMARY KEY (data_id),
+    FOREIGN KEY (lesson_id) REFERENCES lessons (id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS ix_lesson_data_tombstone_lesson_revision ON lesson_data_tombstone (lesson_id, revision);
+
+COMMIT;
@@ -0,0 +1,231 @@
+import json
+import logging
+import os
+import random
+import secrets
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable
+
+import redis
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+JOB_PREFIX = 'jobs:'
+JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL_SECONDS', 7 * 24 * 3600))
+JOB_IDEMPOTENCY_TTL = int(os.getenv('JOB_IDEMPOTENCY_TTL_SECONDS', 24 * 3600))
+
+MIN_PRIORITY = 0
+MAX_PRIORITY = 9
+DEFAULT_PRIORITY = 5
+
+@dataclass
+class JobType:
+    name: str
+    handler: Callable
+    concurrency: int = 4
+    max_retries: int = 5
+    backoff: float = 2.0
+    max_backoff: float = 300.0
+    lease: int = 60
+
+    def retry_delay(self, attempt: int) -> float:
+        # full jitter keeps retries of a shared failure from arriving at S3 in lockstep
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+job_types: dict[str, JobType] = {}
+
+def job(name: str, **options):
+    def register(handler):
+        job_types[name] = JobType(name, handler, **options)
+        return handler
+    return register
+
+def _key(*parts) -> str:
+    return JOB_PREFIX + ':'.join(str(part) for part in parts)
+
+def _now() -> float:
+    return time.time()
+
+def _score(priority: int, now: float) -> int:
+    # lower scores pop first: priority bucket, then enqueue order within it
+    return (MAX_PRIORITY - priority) * 10 ** 13 + int(now * 1000)
+
+# pop the next job of a type only while fewer than `limit` of that type run across all workers
+CLAIM_SCRIPT = """
+local running = tonumber(redis.call('GET', KEYS[2]) or '0')
+if running >= tonumber(ARGV[1]) then
+    return false
+end
+local item = redis.call('ZPOPMIN', KEYS[1])
+if #item == 0 then
+    return false
+end
+redis.call('INCR', KEYS[2])
+redis.call('ZADD', KEYS[3], tonumber(ARGV[2]) + tonumber(ARGV[3]), item[1])
+redis.call('HSET', KEYS[4] .. item[1], 'status', 'running', 'started_at', ARGV[4], 'updated_at', ARGV[4])
+redis.call('HINCRBY', KEYS[4] .. item[1], 'attempts', 1)
+return item[1]
+"""
+
+# release a claimed job; ZREM guards against a reaper having already requeued it
+RELEASE_SCRIPT = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+local running = tonumber(redis.call('DECR', KEYS[2]))
+if running < 0 then
+    redis.call('SET', KEYS[2], 0)
+end
+return 1
+"""
+
+class JobQueue:
+    """Durable job queue on Redis: per-type priority sets, a processing set with leases and a delayed set for retries."""
+
+    def __init__(self, client: redis.Redis):
+        self.client = client
+        self._claim = client.register_script(CLAIM_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+
+    def enqueue(self, job_type: str, payload: dict, priority: int = DEFAULT_PRIORITY, idempotency_key: str | None = None, user_id: int | None = None) -> str:
+        if job_type not in job_types:
+            raise ValueError(f'Unknown job type: {job_type}')
+        priority = max(MIN_PRIORITY, min(MAX_PRIORITY, priority))
+        job_id = secrets.token_hex(12)
+        if idempotency_key is not None:
+            idempotency = _key('idempotency', idempotency_key)
+            if not self.client.set(idempotency, job_id, nx=True, ex=JOB_IDEMPOTENCY_TTL):
+                existing = self.client.get(idempotency)
+                if existing is not None:
+                    return existing
+                self.client.set(idempotency, job_id, ex=JOB_IDEMPOTENCY_TTL)
+
+        now = _now()
+        timestamp = datetime.now(timezone.utc).isoformat()
+        pipe = self.client.pipeline()
+        pipe.hset(_key('job', job_id), mapping={
+            'id': job_id,
+            'type': job_type,
+            'payload': json.dumps(payload),
+            'priority': priority,
+            'status': 'queued',
+            'attempts': 0,
+            'max_retries': job_types[job_type].max_retries,
+            'idempotency_key': idempotency_key or '',
+            'user_id': '' if user_id is None else user_id,
+            'error': '',
+            'created_at': timestamp,
+            'updated_at': timestamp
+        })
+        pipe.zadd(_key('ready', job_type), {job_id: _score(priority, now)})
+        pipe.lpush(_key('notify', job_type), job_id)
+        pipe.ltrim(_key('notify', job_type), 0, 99)
+        pipe.execute()
+        return job_id
+
+    def enqueue_safely(self, job_type: str, payload: dict, **options) -> str | None:
+        # for follow-up work whose loss must not fail a request that already committed
+        try:
+            return self.enqueue(job_type, payload, **options)
+        except redis.RedisError as e:
+            logger.warning(f'Failed to enqueue {job_type} job: {e}')
+            return None
+
+    def get(self, job_id: str) -> dict:
+        data = self.client.hgetall(_key('job', job_id))
+        if not data:
+            raise HTTPException(404, 'Job not found')
+        data['payload'] = json.loads(data['payload'])
+        for field in ('priority', 'attempts', 'max_retries'):
+            data[field] = int(data[field])
+        data['idempotency_key'] = data['idempotency_key'] or None
+        data['user_id'] = int(data['user_id']) if data.get('user_id') else None
+        data['error'] = data['error'] or None
+        return data
+
+    def claim(self, job_type: JobType) -> tuple[str, dict] | None:
+        job_id = self._claim(
+            keys=[_key('ready', job_type.name), _key('running', job_type.name), _key('processing'), _key('job', '')],
+            args=[job_type.concurrency, _now(), job_type.lease, datetime.now(timezone.utc).isoformat()]
+        )
+        if not job_id:
+            return None
+        data = self.client.hmget(_key('job', job_id), 'payload', 'attempts')
+        if data[0] is None:
+            # the job hash expired or was removed while queued
+            self._release(keys=[_key('processing'), _key('running', job_type.name)], args=[job_id])
+            return None
+        return job_id, {'payload': json.loads(data[0]), 'attempts': int(data[1])}
+
+    def wait(self, job_type: JobType, timeout: float):
+        self.client.brpop([_key('notify', job_type.name)], timeout=timeout)
+
+    def extend(self, job_ids: dict[str, JobType]):
+        now = _now()
+        pipe = self.client.pipeline()
+        for job_id, job_type in job_ids.items():
+            pipe.zadd(_key('processing'), {job_id: now + job_type.lease}, xx=True)
+        pipe.execute()
+
+    def _finish(self, job_id: str, job_type: JobType, fields: dict, retry_at: float | None = None) -> bool:
+        if not self._release(keys=[_key('processing'), _key('running', job_type.name)], args=[job_id]):
+            # the lease ran out and the job was handed to another worker; its outcome wins
+            return False
+        fields['updated_at'] = datetime.now(timezone.utc).isoformat()
+        pipe = self.client.pipeline()
+        pipe.hset(_key('job', job_id), mapping=fields)
+        if retry_at is None:
+            pipe.expire(_key('job', job_id), JOB_RESULT_TTL)
+        else:
+            pipe.zadd(_key('delayed'), {job_id: retry_at})
+        pipe.execute()
+        return True
+
+    def succeed(self, job_id: str, job_type: JobType):
+        self._finish(job_id, job_type, {'status': 'succeeded', 'error': ''})
+
+    def fail(self, job_id: str, job_type: JobType, attempts: int, error: str):
+        if attempts > job_type.max_retries:
+            self._finish(job_id, job_type, {'status': 'failed', 'error': error})
+        else:
+            self._finish(job_id, job_type, {'status': 'retrying', 'error': error}, _now() + job_type.retry_delay(attempts))
+
+    def promote_delayed(self, limit: int = 100) -> int:
+        """Moves retries whose backoff has elapsed back onto their ready set."""
+        promoted = 0
+        for job_id in self.client.zrangebyscore(_key('delayed'), '-inf', _now(), start=0, num=limit):
+            if not self.client.zrem(_key('delayed'), job_id):
+                continue
+            self._requeue(job_id)
+            promoted += 1
+        return promoted
+
+    def recover_expired(self, limit: int = 100) -> int:
+        """Requeues jobs whose worker died or stalled past its lease."""
+        recovered = 0
+        for job_id in self.client.zrangebyscore(_key('processing'), '-inf', _now(), start=0, num=limit):
+            job_type = self.client.hget(_key('job', job_id), 'type')
+            if job_type is None:
+                self.client.zrem(_key('processing'), job_id)
+                continue
+            if job_type not in job_types:
+                continue
+            attempts = int(self.client.hget(_key('job', job_id), 'attempts') or 0)
+            logger.warning(f'Job {job_id} ({job_type}) lease expired after attempt {attempts}')
+            self.fail(job_id, job_types[job_type], attempts, 'Lease expired')
+            recovered += 1
+        return recovered
+
+    def _requeue(self, job_id: str):
+        job_type, priority = self.client.hmget(_key('job', job_id), 'type', 'priority')
+        if job_type is None:
+            return
+        pipe = self.client.pipeline()
+        pipe.hset(_key('job', job_id), mapping={'status': 'queued', 'updated_at': datetime.now(timezone.utc).isoformat()})
+        pipe.zadd(_key('ready', job_type), {job_id: _score(int(priority), _now())})
+        pipe.lpush(_key('notify', job_type), job_id)
+        pipe.ltrim(_key('notify', job_type), 0, 99)
+        pipe.execute()
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+
+import redis.asyncio
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'lesson_events:'
+
+def lesson_channel(lesson_id: int) -> str:
+    return f'{CHANNEL_PREFIX}{lesson_id}'
+
+class LessonEventHub:
+    """One Redis pattern subscription per worker, fanned out to local listener queues."""
+
+    def __init__(self, host: str, port: int, db: int, queue_size: int = 100):
+        self.client = redis.asyncio.Redis(host=host, port=port, db=db, decode_responses=True)
+        self.queue_size = queue_size
+        self.listeners: dict[int, set[asyncio.Queue]] = {}
+        self.task: asyncio.Task | None = None
+        self.closing = False
+
+    def start(self):
+        self.task = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.end_streams()
+        await self.client.aclose()
+
+    def end_streams(self):
+        """Ends every open listener; called as soon as the worker starts shutting down, because the
+        server only runs the lifespan shutdown after open connections have drained."""
+        self.closing = True
+        self._end_listeners()
+
+    def _end_listeners(self):
+        for queues in self.listeners.values():
+            for queue in queues:
+                self._end(queue)
+
+    @staticmethod
+    def _end(queue: asyncio.Queue):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    async def _listen(self):
+        delay = 0.5
+        lost = False
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(f'{CHANNEL_PREFIX}*')
+                delay = 0.5
+                if lost:
+                    # streams opened during the outage have missed events as well
+                    self._end_listeners()
+                    lost = False
+                async for message in pubsub.listen():
+                    if message['type'] == 'pmessage':
+                        self._dispatch(message['channel'], message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f'Lesson event subscription lost: {e}; retrying in {delay}s')
+                # pub/sub keeps no backlog, so clients reconnect and catch up through /sync
+                lost = True
+                self._end_listeners()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                await pubsub.aclose()
+
+    def _dispatch(self, channel: str, data: str):
+        try:
+            lesson_id = int(channel[len(CHANNEL_PREFIX):])
+        except ValueError:
+            return
+        for queue in tuple(self.listeners.get(lesson_id, ())):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # a client that cannot keep up is disconnected and re-syncs on reconnect
+                self.listeners[lesson_id].discard(queue)
+                self._end(queue)
+
+    @asynccontextmanager
+    async def listen(self, lesson_id: int):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if self.closing:
+            queue.put_nowait(None)
+        self.listeners.setdefault(lesson_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self.listeners.get(lesson_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self.listeners[lesson_id]
+
+def lesson_event(op: str, data: dict) -> str:
+    return json.dumps({'op': op, 'data': data}, default=str)
+
+def sse_message(event: str) -> str:
+    # the lesson revision as event id lets a reconnecting EventSource report it in Last-Event-ID
+    revision = json.loads(event).get('data', {}).get('revision')
+    if revision is None:
+        return f'data: {event}\n\n'
+    return f'id: {revision}\ndata: {event}\n\n'
@@ -1,12 +1,19 @@
 import redis
+import os
+import logging
 import secrets
+import json
 from datetime import timedelta
 from fastapi import HTTPException
 
+from src.lesson_events import lesson_channel, lesson_event
+
+logger = logging.getLogger(__name__)
+
 class RedisClient:
     def __init__(self):
-        self.host = 'redis'
-        self.port = 6379
+        self.host = os.getenv('REDIS_HOST', 'redis')
+        self.port = int(os.getenv('REDIS_PORT', 6379))
         self.db=2
         self.decode_responses=True
         self.client = redis.Redis(
@@ -49,3 +56,49 @@ class RedisClient:
             raise HTTPException(400, 'Invalid token')
         
         return int(index)
+
+    def create_upload_session(self, session: dict, ttl: timedelta) -> str:
+        upload_id = secrets.token_urlsafe(16)
+        self.client.setex(f'upload_session:{upload_id}', ttl, json.dumps(session))
+        return upload_id
+
+    def get_upload_session(self, upload_id: str) -> dict:
+        session = self.client.get(f'upload_session:{upload_id}')
+        if not session:
+            raise HTTPException(404, 'Upload not found')
+        return json.loads(session)
+
+    def add_upload_part(self, upload_id: str, part_number: int, etag: str, ttl: timedelta):
+        parts_key = f'upload_session:{upload_id}:parts'
+        pipe = self.client.pipeline()
+        pipe.hset(parts_key, part_number, etag)
+        pipe.expire(parts_key, ttl)
+        pipe.expire(f'upload_session:{upload_id}', ttl)
+        pipe.execute()
+
+    def get_upload_parts(self, upload_id: str) -> dict[int, str]:
+        parts = self.client.hgetall(f'upload_session:{upload_id}:parts')
+        return {int(number): etag for number, etag in parts.items()}
+
+    def lock_upload_session(self, upload_id: str, ttl: timedelta) -> bool:
+        return bool(self.client.set(f'upload_session:{upload_id}:lock', 1, nx=True, ex=ttl))
+
+    def unlock_upload_session(self, upload_id: str):
+        self.client.delete(f'upload_session:{upload_id}:lock')
+
+    def delete_upload_session(self, upload_id: str):
+        self.client.delete(
+            f'upload_session:{upload_id}',
+            f'upload_session:{upload_id}:parts',
+            f'upload_session:{upload_id}:lock'
+        )
+
+    def publish_lesson_event(self, lesson_id: int, op: str, data: dict):
+        try:
+            self.client.publish(lesson_channel(lesson_id), lesson_event(op, data))
+        except redis.RedisError as e:
+            logger.warning(f'Failed to publish lesson event: {e}')
+
+    def close(self):
+        self.client.close()
+        self.client.connection_pool.disconnect()
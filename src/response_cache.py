@@ -0,0 +1,86 @@
+import logging
+import os
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL_SECONDS', 300))
+
+# written on lesson deletion so that a read racing the delete cannot repopulate the entry
+DELETED_REVISION = 2 ** 53
+
+# store a variant only if no newer revision has been cached or invalidated meanwhile; an older one is dropped
+STORE_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[1], 'revision'))
+local revision = tonumber(ARGV[1])
+if current and current > revision then
+    return 0
+end
+if current and current < revision then
+    redis.call('DEL', KEYS[1])
+end
+redis.call('HSET', KEYS[1], 'revision', ARGV[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+INVALIDATE_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[1], 'revision'))
+if current and current > tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], 'revision', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+class ResponseCache:
+    """Rendered lesson responses in one Redis hash per lesson, with each compressed encoding stored beside the body.
+
+    Fields are `<variant>:<encoding>`, where the variant identifies the query and
+    `identity` is the uncompressed body, so hot pages are compressed once per encoding."""
+
+    def __init__(self, host: str, port: int, db: int, ttl: int = RESPONSE_CACHE_TTL):
+        # bodies are binary, so this client does not decode responses like RedisClient does
+        self.client = redis.Redis(host=host, port=port, db=db)
+        self.ttl = ttl
+        self._store = self.client.register_script(STORE_SCRIPT)
+        self._invalidate = self.client.register_script(INVALIDATE_SCRIPT)
+
+    @staticmethod
+    def _key(lesson_id: int) -> str:
+        return f'response_cache:lesson:{lesson_id}'
+
+    def get(self, lesson_id: int, variant: str, encoding: str | None) -> tuple[int | None, bytes | None, bytes | None]:
+        """Returns the cached revision, identity body and, if requested, the encoded body."""
+        try:
+            fields = ['revision', f'{variant}:identity']
+            if encoding is not None:
+                fields.append(f'{variant}:{encoding}')
+            values = self.client.hmget(self._key(lesson_id), fields)
+        except redis.RedisError as e:
+            logger.warning(f'Response cache read failed: {e}')
+            return None, None, None
+        revision = int(values[0]) if values[0] is not None else None
+        return revision, values[1], values[2] if encoding is not None else None
+
+    def store(self, lesson_id: int, revision: int, variant: str, bodies: dict[str, bytes]):
+        args = [revision, self.ttl]
+        for encoding, body in bodies.items():
+            args += [f'{variant}:{encoding}', body]
+        try:
+            self._store(keys=[self._key(lesson_id)], args=args)
+        except redis.RedisError as e:
+            logger.warning(f'Response cache write failed: {e}')
+
+    def invalidate(self, lesson_id: int, revision: int = DELETED_REVISION):
+        try:
+            self._invalidate(keys=[self._key(lesson_id)], args=[revision, self.ttl])
+        except redis.RedisError as e:
+            logger.warning(f'Response cache invalidation failed: {e}')
+
+    def close(self):
+        self.client.close()
+        self.client.connection_pool.disconnect()
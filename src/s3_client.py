@@ -1,7 +1,6 @@
-import boto3
 from fastapi import HTTPException
-from botocore.client import Config
 from typing import Optional
+import asyncio
 import os
 import json
 import tempfile
@@ -16,6 +15,10 @@ def generate_file_token(length):
 
 class S3Client:
     def __init__(self):
+        # boto3 is imported here so that importing the app stays cheap; clients are built in the lifespan
+        import boto3
+        from botocore.client import Config
+
         self.endpoint = os.getenv("S3_ENDPOINT")
         self.bucket = os.getenv("S3_BUCKET")
         self.client = boto3.client(
@@ -25,9 +28,8 @@ class S3Client:
             aws_secret_access_key=os.getenv("S3_SECRET_KEY"),
             config=Config(signature_version='s3v4')
         )
-        self._ensure_buckets_exist()
 
-    def _ensure_buckets_exist(self):
+    def ensure_buckets_exist(self):
         try:
             self.client.head_bucket(Bucket=self.bucket)
         except:
@@ -53,6 +55,26 @@ class S3Client:
                 Policy=json.dumps(public_policy)
             )
 
+    def ensure_multipart_cleanup(self, days: int):
+        """Adds a lifecycle rule that aborts multipart uploads left incomplete, keeping any other rules."""
+        from botocore.exceptions import ClientError
+
+        rule_id = 'abort-incomplete-multipart-uploads'
+        try:
+            rules = self.client.get_bucket_lifecycle_configuration(Bucket=self.bucket)['Rules']
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'NoSuchLifecycleConfiguration':
+                raise
+            rules = []
+        rules = [rule for rule in rules if rule.get('ID') != rule_id]
+        rules.append({
+            'ID': rule_id,
+            'Status': 'Enabled',
+            'Filter': {'Prefix': ''},
+            'AbortIncompleteMultipartUpload': {'DaysAfterInitiation': days}
+        })
+        self.client.put_bucket_lifecycle_configuration(Bucket=self.bucket, LifecycleConfiguration={'Rules': rules})
+
     def _generate_unique_filename(self, bucket: str, prefix: str, filename: str) -> str:
         base, ext = os.path.splitext(filename)
         counter = 1
@@ -86,6 +108,48 @@ class S3Client:
         except Exception as e:
             raise HTTPException(500, f"Error uploading file: {e}")
     
+    def create_multipart_upload(self, file_type: str, lesson_id: int, filename: str):
+        try:
+            base, ext = os.path.splitext(filename.split('/')[-1])
+            # the object only appears on completion, so uniqueness comes from a random suffix instead of head_object
+            s3_key = f"{file_type}/{lesson_id}/{base}_{generate_file_token(8)}{ext}"
+            response = self.client.create_multipart_upload(Bucket=self.bucket, Key=s3_key)
+            return s3_key, response['UploadId']
+        except Exception as e:
+            raise HTTPException(500, f"Error creating upload: {e}")
+
+    async def upload_part(self, s3_key: str, upload_id: str, part_number: int, body) -> str:
+        try:
+            response = await asyncio.to_thread(
+                self.client.upload_part,
+                Bucket=self.bucket,
+                Key=s3_key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=body
+            )
+            return response['ETag']
+        except Exception as e:
+            raise HTTPException(502, f"Error uploading part: {e}")
+
+    async def complete_multipart_upload(self, s3_key: str, upload_id: str, parts: dict[int, str]):
+        try:
+            await asyncio.to_thread(
+                self.client.complete_multipart_upload,
+                Bucket=self.bucket,
+                Key=s3_key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': [{'PartNumber': number, 'ETag': parts[number]} for number in sorted(parts)]}
+            )
+        except Exception as e:
+            raise HTTPException(502, f"Error completing upload: {e}")
+
+    def abort_multipart_upload(self, s3_key: str, upload_id: str):
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=s3_key, UploadId=upload_id)
+        except Exception as e:
+            raise HTTPException(500, f"Error aborting upload: {e}")
+
     async def upload_avatar(self, file):
         try:
             type = file.filename.split('.')[-1]
@@ -128,4 +192,40 @@ class S3Client:
                 Key=s3_key
             )
         except Exception as e:
-            raise HTTPException(500, f'Error deleting file: {e}')
\ No newline at end of file
+            raise HTTPException(500, f'Error deleting file: {e}')
+
+    def _copy_file(self, source_key: str, target_key: str):
+        # managed copy: a HeadObject for the size, then CopyObject, or UploadPartCopy parts above the
+        # transfer config's 8 MB multipart_threshold; the data never leaves S3
+        self.client.copy({'Bucket': self.bucket, 'Key': source_key}, self.bucket, target_key)
+
+    async def copy_files(self, keys: dict[str, str], concurrency: int = 16):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def copy(source_key, target_key):
+            async with semaphore:
+                await asyncio.to_thread(self._copy_file, source_key, target_key)
+                return target_key
+
+        results = await asyncio.gather(*(copy(source, target) for source, target in keys.items()), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            copied = [result for result in results if not isinstance(result, Exception)]
+            await asyncio.to_thread(self.delete_files, copied)
+            raise HTTPException(500, f'Error copying files: {errors[0]}')
+
+    def delete_files(self, s3_keys: list[str]):
+        for start in range(0, len(s3_keys), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': key} for key in s3_keys[start:start + 1000]], 'Quiet': True}
+            )
+
+    def delete_prefix(self, prefix: str) -> int:
+        deleted = 0
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            keys = [item['Key'] for item in page.get('Contents', ())]
+            self.delete_files(keys)
+            deleted += len(keys)
+        return deleted
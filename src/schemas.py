@@ -1,6 +1,6 @@
 from datetime import datetime
 from src.database.models import LessonDataType
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 class LessonListDTO(BaseModel):
     title: str
@@ -20,6 +20,9 @@ class LessonListFullDTO(LessonListReadDTO):
     username: str | None
     email: str | None
 
+class LessonUsersDTO(BaseModel):
+    user_ids: list[int] = Field(max_length=10000)
+
 class LessonDataDTO(BaseModel):
 
     type: LessonDataType
@@ -31,6 +34,13 @@ class LessonDataUpdateDTO(LessonDataDTO):
 
 class LessonDataReadDTO(LessonDataUpdateDTO):
     lesson_id: int
+    revision: int
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class UploadCreateDTO(BaseModel):
+    type: LessonDataType
+    filename: str = Field(min_length=1)
+    size: int = Field(gt=0)
+    order: int
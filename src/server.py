@@ -0,0 +1,134 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import random
+import signal
+import sys
+import threading
+import time
+
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+logger = logging.getLogger('uvicorn.error')
+
+class ServerSettings(BaseSettings):
+    SERVER_HOST: str = '0.0.0.0'
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = Field(default_factory=lambda: os.cpu_count() or 1)
+    SERVER_BACKLOG: int = 2048
+    SERVER_KEEP_ALIVE: int = 5
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+    SERVER_MAX_REQUESTS: int = 0
+    SERVER_MAX_REQUESTS_JITTER: int = 0
+    SERVER_MAX_MEMORY_MB: int = 0
+    SERVER_MEMORY_CHECK_INTERVAL: float = 5.0
+
+    model_config = SettingsConfigDict(env_file='.env', extra='ignore')
+
+server_settings = ServerSettings()
+
+def current_rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        # resource is POSIX-only; without it the memory limit never triggers
+        return 0.0
+    # peak rather than current RSS, in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def on_shutdown_signal(callback):
+    """Runs callback on the event loop when SIGINT/SIGTERM arrives, then hands the signal on.
+
+    Called from the lifespan, where the installed handlers are uvicorn's; this covers deploys,
+    supervisor restarts and WorkerRecycler alike, before uvicorn starts draining connections.
+    Returns a function that puts the previous handlers back, for the lifespan shutdown."""
+    installed = {}
+    if threading.current_thread() is not threading.main_thread():
+        return lambda: None
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(callback)
+            previous(signum, frame)
+        signal.signal(sig, handler)
+        installed[sig] = (handler, previous)
+
+    def restore():
+        for sig, (handler, previous) in installed.items():
+            # leave alone a handler someone installed after ours
+            if signal.getsignal(sig) is handler:
+                signal.signal(sig, previous)
+        installed.clear()
+    return restore
+
+class WorkerRecycler:
+    """ASGI middleware that asks its worker to shut down gracefully after a
+    request or memory limit, so the supervisor replaces it with a fresh one."""
+
+    def __init__(self, app, max_requests: int = 0, max_requests_jitter: int = 0, max_memory_mb: int = 0, check_interval: float = 5.0):
+        self.app = app
+        self.max_requests = max_requests + random.randint(0, max_requests_jitter) if max_requests else 0
+        self.max_memory_mb = max_memory_mb
+        self.check_interval = check_interval
+        self.requests = 0
+        self.last_check = time.monotonic()
+        self.recycling = False
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and not self.recycling:
+            self.requests += 1
+            if self.max_requests and self.requests >= self.max_requests:
+                self.recycle(f'served {self.requests} requests')
+            elif self.max_memory_mb:
+                now = time.monotonic()
+                if now - self.last_check >= self.check_interval:
+                    self.last_check = now
+                    rss = current_rss_mb()
+                    if rss > self.max_memory_mb:
+                        self.recycle(f'RSS {rss:.0f} MB over {self.max_memory_mb} MB')
+        await self.app(scope, receive, send)
+
+    def recycle(self, reason: str):
+        self.recycling = True
+        logger.info(f'Recycling worker [{os.getpid()}]: {reason}')
+        os.kill(os.getpid(), signal.SIGTERM)
+
+def run(settings: ServerSettings = server_settings):
+    import uvicorn
+    from uvicorn.supervisors import Multiprocess
+
+    config = uvicorn.Config(
+        'main:app',
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=settings.SERVER_WORKERS,
+        # uvloop has no Windows build, see the marker in requirements.txt
+        loop='uvloop' if importlib.util.find_spec('uvloop') else 'asyncio',
+        http='httptools',
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEP_ALIVE,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+        proxy_headers=True,
+        access_log=False,
+    )
+    # always run under the supervisor so recycled workers are restarted, even with a single worker
+    sock = config.bind_socket()
+    server = uvicorn.Server(config)
+    Multiprocess(config, target=server.run, sockets=[sock]).run()
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,20 @@
+from functools import cache
+
+from src.jobs import job
+from src.s3_client import S3Client
+from src.database.models import MEDIA_TYPES
+
+@cache
+def get_s3_client() -> S3Client:
+    return S3Client()
+
+@job('delete_file', concurrency=16, max_retries=8)
+def delete_file(key: str):
+    # S3 DeleteObject succeeds for missing keys, so a retried job is harmless
+    get_s3_client().delete_file(key)
+
+@job('delete_lesson_media', concurrency=2, max_retries=8, lease=300)
+def delete_lesson_media(lesson_id: int):
+    s3_client = get_s3_client()
+    for media_type in MEDIA_TYPES:
+        s3_client.delete_prefix(f'{media_type.value}/{lesson_id}/')
@@ -0,0 +1,83 @@
+import asyncio
+import math
+import os
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from fastapi import HTTPException, Request
+
+# S3 rejects multipart parts under 5 MiB (except the last one) and uploads over 10000 parts
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+# chunks grow past UPLOAD_CHUNK_SIZE only above MAX_PARTS chunks, so this also caps the chunk held in memory
+UPLOAD_MAX_SIZE = int(os.getenv('UPLOAD_MAX_SIZE', 10 * 1024 ** 3))
+UPLOAD_SESSION_TTL = timedelta(hours=int(os.getenv('UPLOAD_SESSION_TTL_HOURS', 24)))
+# a chunk must arrive within this time, so a slow client cannot hold a buffer slot indefinitely
+UPLOAD_PART_TIMEOUT = float(os.getenv('UPLOAD_PART_TIMEOUT_SECONDS', 60))
+# S3 aborts multipart uploads still incomplete this long after they started; set up by src.bootstrap
+UPLOAD_ABORT_AFTER_DAYS = int(os.getenv('UPLOAD_ABORT_AFTER_DAYS', 7))
+
+# each in-flight chunk is held in memory once, so this bounds upload buffering per worker
+part_buffers = asyncio.Semaphore(int(os.getenv('UPLOAD_MAX_BUFFERED_PARTS', 4)))
+
+@asynccontextmanager
+async def part_buffer():
+    try:
+        await asyncio.wait_for(part_buffers.acquire(), UPLOAD_PART_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(503, 'Too many chunk uploads in progress', headers={'Retry-After': '5'})
+    try:
+        yield
+    finally:
+        part_buffers.release()
+
+def chunk_size_for(size: int) -> int:
+    return max(UPLOAD_CHUNK_SIZE, MIN_PART_SIZE, math.ceil(size / MAX_PARTS))
+
+def part_count(session: dict) -> int:
+    return math.ceil(session['size'] / session['chunk_size'])
+
+def part_for_offset(session: dict, offset: int) -> int:
+    if offset < 0 or offset >= session['size'] or offset % session['chunk_size']:
+        return 0
+    return offset // session['chunk_size'] + 1
+
+def part_length(session: dict, part_number: int) -> int:
+    return min(session['chunk_size'], session['size'] - (part_number - 1) * session['chunk_size'])
+
+def contiguous_offset(session: dict, parts: dict[int, str]) -> int:
+    part_number = 1
+    while part_number in parts:
+        part_number += 1
+    return min((part_number - 1) * session['chunk_size'], session['size'])
+
+def upload_status(upload_id: str, session: dict, parts: dict[int, str]) -> dict:
+    return {
+        'id': upload_id,
+        'lesson_id': session['lesson_id'],
+        'size': session['size'],
+        'chunk_size': session['chunk_size'],
+        'parts': part_count(session),
+        'received_parts': sorted(parts),
+        'offset': contiguous_offset(session, parts)
+    }
+
+async def read_part(request: Request, length: int) -> bytearray:
+    declared = request.headers.get('content-length')
+    if declared is not None and int(declared) != length:
+        raise HTTPException(400, f'Chunk must be {length} bytes')
+    try:
+        return await asyncio.wait_for(_read_body(request, length), UPLOAD_PART_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(408, 'Chunk upload timed out')
+
+async def _read_body(request: Request, length: int) -> bytearray:
+    body = bytearray()
+    async for piece in request.stream():
+        body.extend(piece)
+        if len(body) > length:
+            raise HTTPException(413, f'Chunk must be {length} bytes')
+    if len(body) != length:
+        raise HTTPException(400, 'Incomplete chunk')
+    return body
@@ -0,0 +1,130 @@
+import logging
+import signal
+import threading
+import time
+import traceback
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+import src.tasks  # noqa: F401 - registers the job handlers
+from src.jobs import JobQueue, JobType, job_types
+from src.redis_client import RedisClient
+
+logger = logging.getLogger(__name__)
+
+class WorkerSettings(BaseSettings):
+    # comma-separated job types this process consumes; empty means all of them
+    WORKER_JOB_TYPES: str = ''
+    WORKER_POLL_INTERVAL: float = 1.0
+    WORKER_MAINTENANCE_INTERVAL: float = 1.0
+    WORKER_GRACEFUL_TIMEOUT: int = 30
+
+    model_config = SettingsConfigDict(env_file='.env', extra='ignore')
+
+class Worker:
+    """Runs queued jobs in one thread per concurrency slot of each job type.
+
+    Redis enforces each type's concurrency across all worker processes, so
+    extra processes add capacity only up to that limit."""
+
+    def __init__(self, queue: JobQueue, types: list[JobType], settings: WorkerSettings):
+        self.queue = queue
+        self.types = types
+        self.settings = settings
+        self.stopping = threading.Event()
+        self.stopped = threading.Event()
+        self.running: dict[str, JobType] = {}
+        self.lock = threading.Lock()
+        self.threads: list[threading.Thread] = []
+
+    def start(self):
+        for job_type in self.types:
+            for slot in range(job_type.concurrency):
+                self.threads.append(threading.Thread(target=self._consume, args=(job_type,), name=f'{job_type.name}-{slot}', daemon=True))
+        self.maintenance = threading.Thread(target=self._maintain, name='maintenance', daemon=True)
+        for thread in (*self.threads, self.maintenance):
+            thread.start()
+        logger.info(f'Worker consuming {", ".join(f"{t.name} x{t.concurrency}" for t in self.types)}')
+
+    def stop(self, *_):
+        logger.info('Worker stopping; waiting for running jobs')
+        self.stopping.set()
+
+    def join(self):
+        deadline = time.monotonic() + self.settings.WORKER_GRACEFUL_TIMEOUT
+        for thread in self.threads:
+            thread.join(max(0, deadline - time.monotonic()))
+        # leases are kept alive until the last job finishes
+        self.stopped.set()
+        self.maintenance.join()
+        with self.lock:
+            # whatever is still running is picked up by another worker once its lease expires
+            if self.running:
+                logger.warning(f'Abandoning {len(self.running)} running jobs')
+
+    def _consume(self, job_type: JobType):
+        while not self.stopping.is_set():
+            try:
+                claimed = self.queue.claim(job_type)
+                if claimed is None:
+                    self.queue.wait(job_type, self.settings.WORKER_POLL_INTERVAL)
+                    continue
+            except Exception as e:
+                logger.warning(f'Failed to claim {job_type.name} job: {e}')
+                self.stopping.wait(self.settings.WORKER_POLL_INTERVAL)
+                continue
+            self._run(job_type, *claimed)
+
+    def _run(self, job_type: JobType, job_id: str, job: dict):
+        with self.lock:
+            self.running[job_id] = job_type
+        try:
+            job_type.handler(**job['payload'])
+        except Exception as e:
+            logger.warning(f'Job {job_id} ({job_type.name}) attempt {job["attempts"]} failed: {e}')
+            logger.debug(traceback.format_exc())
+            self._report(self.queue.fail, job_id, job_type, job['attempts'], f'{type(e).__name__}: {e}')
+        else:
+            self._report(self.queue.succeed, job_id, job_type)
+        finally:
+            with self.lock:
+                self.running.pop(job_id, None)
+
+    def _report(self, report, *args):
+        try:
+            report(*args)
+        except Exception as e:
+            # the lease is still held, so the job is retried once it expires
+            logger.warning(f'Failed to record outcome of job {args[0]}: {e}')
+
+    def _maintain(self):
+        while not self.stopped.wait(self.settings.WORKER_MAINTENANCE_INTERVAL):
+            try:
+                with self.lock:
+                    running = dict(self.running)
+                if running:
+                    self.queue.extend(running)
+                self.queue.promote_delayed()
+                self.queue.recover_expired()
+            except Exception as e:
+                logger.warning(f'Job queue maintenance failed: {e}')
+
+def run(settings: WorkerSettings | None = None):
+    settings = settings or WorkerSettings()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    names = [name.strip() for name in settings.WORKER_JOB_TYPES.split(',') if name.strip()] or list(job_types)
+    unknown = [name for name in names if name not in job_types]
+    if unknown:
+        raise SystemExit(f'Unknown job types: {", ".join(unknown)}')
+
+    redis_client = RedisClient()
+    worker = Worker(JobQueue(redis_client.client), [job_types[name] for name in names], settings)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.start()
+    worker.stopping.wait()
+    worker.join()
+    redis_client.close()
+
+if __name__ == '__main__':
+    run()